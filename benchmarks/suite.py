@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Solves a fixed corpus of instances, recording results as JSON, and compares results of two runs.
+
+Run from the repository root with:
+
+    python -m benchmarks.suite run --output before.json
+    # ... change the model ...
+    python -m benchmarks.suite run --output after.json
+    python -m benchmarks.suite compare before.json after.json
+
+compare exits with status 1 if any regression is found.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import sys
+import time
+import ortools
+from octaopticon import problem as octaopticon
+from solver.generator import generate
+from solver.solver import CLASSIC, FORMULATIONS, ModelTemplateCache, Problem, SolverConfig, solve
+from solver.verifier import simulate
+
+# bump whenever instances are added, removed or changed, results of different versions are not comparable
+CORPUS_VERSION = 2
+
+# geometries of the scaling grid, all combinations with S divisible by A are included
+# each geometry has a planted instance, and a near-feasible one with PERTURBATION of its pixels changed
+PERTURBATION = 0.02
+GRID = {
+    "P": [2, 3],
+    "S": [4, 8],
+    "W": [1, 2, 4],
+    "A": [4, 8],
+    "M": [2, 4],
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_solution(path: str) -> (list, list):
+    """Parses α and n from the output of octaopticon.py, as saved in hack_week_*.txt"""
+    α = {}
+    n = []
+    i = None
+    with open(path) as file:
+        for line in file:
+            match = re.match(r"α for pizza (\d+):", line)
+            if match:
+                i = int(match.group(1))
+                α[i] = []
+                continue
+            match = re.match(r"\s+slice \d+: (\[.*\])", line)
+            if match and i is not None:
+                α[i].append(json.loads(match.group(1)))
+                continue
+            match = re.match(r"offsets to reconstruct image \d+: (\[.*\])", line)
+            if match:
+                n.append(json.loads(match.group(1)))
+    return [α[i] for i in sorted(α)], n
+
+
+def solution_problem(path: str, A: int) -> Problem:
+    """Returns the problem whose images are the ones reproduced by a saved solution"""
+    α, n = parse_solution(path)
+    return Problem(len(α), len(α[0]), len(α[0][0]), A, simulate(α, n).tolist())
+
+
+def corpus() -> list[(str, Problem, bool)]:
+    """
+    Returns the list of (name, problem, expected) instances of the benchmark, see CORPUS_VERSION.
+
+    expected is the known success of solving problem, or None if it is not known.
+    """
+    instances = [
+        ("octaopticon", octaopticon, None),
+        # images of the solutions found during hack week, with 45 degree filter angles
+        ("hack_week_small", solution_problem(os.path.join(ROOT, "hack_week_small.txt"), 8), True),
+        ("hack_week_big", solution_problem(os.path.join(ROOT, "hack_week_big.txt"), 8), True),
+    ]
+    for seed, (P, S, W, A, M) in enumerate(itertools.product(*GRID.values())):
+        if S % A == 0:
+            name = f"grid/P{P}-S{S}-W{W}-A{A}-M{M}"
+            instances.append((name, generate(P, S, W, A, M, seed)[0], True))
+            instances.append((name + "-perturbed", generate(P, S, W, A, M, seed, PERTURBATION)[0], None))
+    return instances
+
+
+STATUSES = {True: "feasible", False: "infeasible", None: "unknown"}
+
+
+def run(args):
+    config = SolverConfig(
+        max_time_in_seconds=args.max_time,
+        num_workers=args.workers,
+        random_seed=args.seed,
+        deterministic=args.deterministic,
+    )
+    results = []
+    for name, problem, expected in corpus():
+        if args.only and not re.search(args.only, name):
+            continue
+        for repetition in range(args.repeat):
+            # templates are not shared, so that every instance pays for building its model
+            start = time.perf_counter()
+            solution = solve(problem, args.formulation, args.symmetry_breaking, templates=ModelTemplateCache(), config=config)
+            total_time = time.perf_counter() - start
+
+            status = STATUSES[solution.success]
+            wrong = solution.success is not None and expected is not None and solution.success != expected
+            print(f"{name:32s} {status:10s} {total_time:9.3f}s{' WRONG ANSWER' if wrong else ''}", flush=True)
+            results.append({
+                "name": name,
+                "repetition": repetition,
+                "geometry": [problem.P, problem.S, problem.W, problem.A, len(problem.p)],
+                "status": status,
+                "expected": STATUSES[expected],
+                "wall_time": solution.wall_time,
+                "total_time": total_time,
+                "telemetry": solution.telemetry.to_dict() if solution.telemetry else None,
+            })
+
+    report = {
+        "corpus_version": CORPUS_VERSION,
+        "formulation": args.formulation,
+        "symmetry_breaking": args.symmetry_breaking,
+        "config": {key: value for key, value in vars(config).items() if key != "parameters"},
+        "environment": {"python": platform.python_version(), "ortools": ortools.__version__, "cpus": os.cpu_count()},
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=1)
+
+
+def compare(args) -> int:
+    """Prints differences between two runs, returns the count of regressions"""
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    if before["corpus_version"] != after["corpus_version"]:
+        print(f"warning: corpus versions differ ({before['corpus_version']} and {after['corpus_version']})")
+
+    def by_name(report: dict) -> dict:
+        """Groups results by instance, keeping the median total time among repetitions"""
+        grouped = {}
+        for result in report["results"]:
+            grouped.setdefault(result["name"], []).append(result)
+        return {name: sorted(rs, key=lambda r: r["total_time"])[len(rs) // 2] for name, rs in grouped.items()}
+
+    before = by_name(before)
+    after = by_name(after)
+    regressions = 0
+    for name in sorted(before.keys() & after.keys()):
+        b = before[name]
+        a = after[name]
+        problems = []
+        if "unknown" not in (a["status"], a["expected"]) and a["status"] != a["expected"]:
+            problems.append(f"WRONG ANSWER, {a['expected']} expected")
+        elif "unknown" not in (a["status"], b["status"]) and a["status"] != b["status"]:
+            problems.append(f"WRONG ANSWER, {b['status']} before")
+        elif a["status"] == "unknown" and b["status"] != "unknown":
+            problems.append(f"timed out, {b['status']} before")
+        elif a["total_time"] > b["total_time"] * args.threshold and a["total_time"] - b["total_time"] > args.min_time:
+            problems.append("slower")
+
+        regressions += len(problems) > 0
+        if problems or args.verbose:
+            ratio = a["total_time"] / b["total_time"] if b["total_time"] > 0 else float("inf")
+            print(f"{name:32s} {b['total_time']:9.3f}s -> {a['total_time']:9.3f}s ({ratio:5.2f}x) {a['status']:10s} {', '.join(problems)}")
+
+    for name in sorted(before.keys() - after.keys()):
+        print(f"{name:32s} missing from {args.after}")
+    for name in sorted(after.keys() - before.keys()):
+        print(f"{name:32s} missing from {args.before}")
+
+    print(f"{regressions} regression(s) in {len(before.keys() & after.keys())} common instance(s)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="solve all instances of the corpus")
+    run_parser.add_argument("--output", required=True, help="path of the JSON results")
+    run_parser.add_argument("--only", help="regular expression selecting instances by name")
+    run_parser.add_argument("--formulation", choices=FORMULATIONS, default=CLASSIC)
+    run_parser.add_argument("--symmetry-breaking", action="store_true")
+    run_parser.add_argument("--max-time", type=float, default=60, help="time limit per instance, in seconds")
+    run_parser.add_argument("--workers", type=int, default=1, help="count of CP-SAT search workers")
+    run_parser.add_argument("--seed", type=int, default=0, help="CP-SAT random seed")
+    run_parser.add_argument("--deterministic", action="store_true", help="make results reproducible across runs")
+    run_parser.add_argument("--repeat", type=int, default=1, help="count of solves per instance")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two runs")
+    compare_parser.add_argument("before", help="path of the JSON results of the baseline run")
+    compare_parser.add_argument("after", help="path of the JSON results of the run to check")
+    compare_parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio considered a regression")
+    compare_parser.add_argument("--min-time", type=float, default=0.1, help="slowdown in seconds ignored as noise")
+    compare_parser.add_argument("--verbose", action="store_true", help="print all common instances")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(1 if compare(args) else 0)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compares solve times with and without symmetry breaking on the test_solve_randomized instance family.
+
+Run from the repository root with:
+
+    python -m benchmarks.symmetry_breaking
+"""
+
+import argparse
+import random
+from ortools.sat.python import cp_model
+from solver.solver import CLASSIC, FORMULATIONS, Problem, build_model, compute_transitions
+
+
+def generate_problems(max_windows: int) -> list[Problem]:
+    """Generates the same instances as tests/test_solver.py::test_solve_randomized"""
+    random.seed(0)
+    problems = []
+    for W in range(1, max_windows + 1):
+        for P in range(2, 4):
+            for S in [3, 4, 6, 8]:
+                for A in [2, 3, 4]:
+                    if S % A != 0:
+                        continue
+                    for M in range(2, 6):
+                        transitions = compute_transitions(A, P)
+                        p = [[[random.choice(transitions)[2] for k in range(W)] for j in range(S)] for _ in range(M)]
+                        problems.append(Problem(P, S, W, A, p))
+    return problems
+
+
+def run(problem: Problem, formulation: str, symmetry_breaking: bool, max_time_in_seconds: float) -> (str, float):
+    """Returns the status name and wall time of solving problem"""
+    built = build_model(problem, formulation, symmetry_breaking)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    status = solver.Solve(built.model)
+    return solver.StatusName(status), solver.WallTime()
+
+
+def summarize(times: list[float]) -> str:
+    if not times:
+        return "-"
+    return f"count {len(times):4d}, total {sum(times):8.3f}s, mean {sum(times) / len(times):7.4f}s, max {max(times):7.3f}s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-windows", type=int, default=5, help="largest W in the instance family")
+    parser.add_argument("--formulation", choices=FORMULATIONS, default=CLASSIC)
+    parser.add_argument("--max-time", type=float, default=60, help="time limit per instance, in seconds")
+    args = parser.parse_args()
+
+    problems = generate_problems(args.max_windows)
+    for symmetry_breaking in [False, True]:
+        times = {"OPTIMAL": [], "INFEASIBLE": [], "UNKNOWN": []}
+        for problem in problems:
+            status, wall_time = run(problem, args.formulation, symmetry_breaking, args.max_time)
+            # without an objective, the first feasible solution is optimal
+            times.setdefault(status, []).append(wall_time)
+
+        print(f"symmetry breaking {'on' if symmetry_breaking else 'off'}:")
+        print(f"    time to first feasible:   {summarize(times['OPTIMAL'])}")
+        print(f"    time to prove infeasible: {summarize(times['INFEASIBLE'])}")
+        print(f"    unknown:                  {summarize(times['UNKNOWN'])}")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Converts artwork into OctaOpticon problems, printed as JSON lines.
+
+Run from the repository root with:
+
+    python ingest.py DIRECTORY --pizzas 3 --angles 8 --geometry big
+
+Every subdirectory of DIRECTORY with PNG or SVG images is a design, its images in name order are the images of one
+problem. Images directly in DIRECTORY make a design too. SVG images are rasterized with cairosvg, which is optional.
+"""
+
+import argparse
+import io
+import json
+import os
+import numpy as np
+from PIL import Image
+from printer import GEOMETRIES, compute_window_centers
+from solver.solver import Problem, compute_energy_levels
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    # OSError if cairosvg is installed, but not the cairo library it binds to
+    cairosvg = None
+
+EXTENSIONS = (".png", ".svg")
+
+
+def load_image(path: str) -> np.ndarray:
+    """
+    Loads a PNG or SVG image as an array of gray levels in range 0-1, shaped (height, width).
+
+    Transparent areas are composited over white. SVG images are rasterized with cairosvg, which must be installed.
+    """
+    if path.lower().endswith(".svg"):
+        if cairosvg is None:
+            raise ImportError(f"cairosvg is needed to load {path}, install it with: pip install cairosvg")
+        path = io.BytesIO(cairosvg.svg2png(url=path))
+    with Image.open(path) as image:
+        samples = np.asarray(image.convert("RGBA")) / 255.0
+    color, alpha = samples[:, :, :3], samples[:, :, 3:]
+    # ITU-R BT.601 luma
+    return (color * alpha + (1 - alpha)).dot([0.299, 0.587, 0.114])
+
+
+def sample(image: np.ndarray, S: int, geometry: tuple = GEOMETRIES["big"], samples_per_window: int = 5) -> np.ndarray:
+    """
+    Samples an image at the windows of a pizza, see printer.compute_window_centers.
+
+    The pizza is centered on the image, and scaled to fit in it. Each window is sampled on a grid of
+    samples_per_window x samples_per_window points, which are averaged. The grid spans half the diameter of the window,
+    so outlines drawn around windows are not sampled.
+
+    geometry is a (max_size_mm, circle_radius_mm, radii) triplet, as in printer.GEOMETRIES
+
+    Returns an array of gray levels in range 0-1 shaped (S, W).
+    """
+    max_size_mm, circle_radius_mm, radii = geometry
+    height, width = image.shape
+    scale = min(height, width) / max_size_mm
+
+    centers = compute_window_centers(S, max_size_mm, radii) * scale + [width / 2, height / 2]
+    offsets = np.linspace(-0.5, 0.5, samples_per_window) * circle_radius_mm * scale
+    x = centers[:, :, 0, None, None] + offsets[None, None, None, :]
+    y = centers[:, :, 1, None, None] + offsets[None, None, :, None]
+    columns = np.clip(np.round(x).astype(int), 0, width - 1)
+    rows = np.clip(np.round(y).astype(int), 0, height - 1)
+    return image[rows, columns].mean(axis=(2, 3))
+
+
+def quantize(levels: np.ndarray, A: int, P: int, S: int) -> np.ndarray:
+    """Returns the energies reachable by a stack of P pizzas nearest to gray levels in range 0-1, as an int array"""
+    energies = np.array(compute_energy_levels(A, P, S)[-1])
+    midpoints = (energies[1:] + energies[:-1]) / 2
+    return energies[np.searchsorted(midpoints, np.asarray(levels) * 100)]
+
+
+def load_problem(paths: list[str], P: int, S: int, A: int, geometry: tuple = GEOMETRIES["big"], tolerance: int = 0) -> Problem:
+    """Returns the problem of reproducing the images at paths, one image per path, see sample and quantize"""
+    p = [quantize(sample(load_image(path), S, geometry), A, P, S).tolist() for path in paths]
+    W = len(p[0][0]) if p else 0
+    return Problem(P, S, W, A, p, tolerance)
+
+
+def iter_problems(directory: str, P: int, S: int, A: int, geometry: tuple = GEOMETRIES["big"], tolerance: int = 0):
+    """
+    Loads designs from a directory, see the module documentation.
+
+    Yields (name, Problem) pairs, one design at a time, so directories of any size can be fed to solve_many.
+    """
+    for root, directories, files in os.walk(directory):
+        directories.sort()
+        paths = sorted(os.path.join(root, name) for name in files if name.lower().endswith(EXTENSIONS))
+        if paths:
+            yield os.path.relpath(root, directory), load_problem(paths, P, S, A, geometry, tolerance)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="directory of designs")
+    parser.add_argument("--pizzas", type=int, default=3, help="count of pizzas (P)")
+    parser.add_argument("--slices", type=int, default=8, help="count of slices per pizza (S)")
+    parser.add_argument("--angles", type=int, default=8, help="count of possible filter angles (A)")
+    parser.add_argument("--geometry", choices=list(GEOMETRIES), default="big", help="window layout, as in printer.py")
+    parser.add_argument("--tolerance", type=int, default=0, help="tolerance of pixel values")
+    args = parser.parse_args()
+
+    for name, problem in iter_problems(args.directory, args.pizzas, args.slices, args.angles, GEOMETRIES[args.geometry], args.tolerance):
+        print(json.dumps({"name": name, "problem": problem.to_dict()}), flush=True)
@@ -68,7 +68,7 @@ if __name__ == "__main__":
     if solution.success:
         print("\n\n**DEBUG INFORMATION**\n")
         for m in range(len(problem.p)):
-            print(f"offsets to reconstruct image {m}: {solution.n[m]}")
+            print(f"offsets to reconstruct image {m}: {solution.n[m].tolist()}")
             for i in range(problem.P):
                 print(f"    pizza {i}, rotation {solution.n[m][i]}")
                 for j in range(problem.S):
@@ -82,9 +82,9 @@ if __name__ == "__main__":
         for i in reversed(range(problem.P)):
             print(f"α for pizza {i}:")
             for j in range(problem.S):
-                print(f"    slice {j}: {solution.α[i][j]}")
+                print(f"    slice {j}: {solution.α[i][j].tolist()}")
         for m in range(len(problem.p)):
-            print(f"offsets to reconstruct image {m}: {solution.n[m]}")
+            print(f"offsets to reconstruct image {m}: {solution.n[m].tolist()}")
 
     else:
         print("no result")
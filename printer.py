@@ -2,9 +2,21 @@
 # -*- coding: utf-8 -*-
 """Outputs an SVG for an octaopticon"""
 
+import argparse
+import json
 import math
 import os
+import sys
 import webbrowser
+from xml.sax.saxutils import escape
+import numpy as np
+from solver.solver import Solution
+
+# pizza geometries, as (max_size_mm, circle_radius_mm, radii) arguments of generate_elements
+# radii lists [count, fraction of max_size_mm] of rings of windows, the central window is not part of any slice
+SMALL = (95, 5, [[1, 0], [8, 13 / 32], [8, 23 / 32]])
+BIG = (200, 5, [[1, 0], [8, 7 / 32], [8, 12 / 32], [16, 17 / 32], [16, 22 / 32], [8, 27 / 32]])
+GEOMETRIES = {"small": SMALL, "big": BIG}
 
 
 def generate_octagon_star_points(max_size_mm, x_offset, y_offset):
@@ -55,6 +67,30 @@ def generate_circle_centers(n, max_size_mm, x_offset, y_offset):
     return centers
 
 
+def compute_window_centers(S, max_size_mm, radii, x_offset=0, y_offset=0):
+    """
+    Returns the centers of the windows drawn by generate_elements, as an array shaped (S, W, 2).
+        - centers[j][k] is the (x, y) center of window k on slice j
+        - slice 0 starts at the top, slices proceed clockwise
+        - windows of a slice are numbered as in solver.solver.Problem, 0 being the top left, proceeding by columns then
+          rows: rows are rings, from the outermost (the top of slice 0), and columns proceed clockwise within a ring
+    Rings with fewer windows than slices are skipped, other rings must have a multiple of S windows.
+    """
+    centers = []
+    for count, fraction in sorted(radii, key=lambda ring: -ring[1]):
+        if count < S:
+            continue
+        if count % S != 0:
+            raise ValueError(f"a ring of {count} windows cannot be split into {S} slices")
+        angles = 2 * np.pi * np.arange(count) / count
+        # angles clockwise from the top, in SVG coordinates where y grows downwards
+        from_top = np.round(np.degrees(angles + np.pi / 2), 9) % 360
+        order = np.argsort(from_top, kind="stable").reshape(S, count // S)
+        radius = max_size_mm * fraction / 2
+        centers.append(np.stack([x_offset + radius * np.cos(angles[order]), y_offset + radius * np.sin(angles[order])], axis=-1))
+    return np.concatenate(centers, axis=1)
+
+
 def generate_elements(max_size_mm, circle_radius_mm, radii, x_offset, y_offset):
     polygon_points_str = generate_octagon_star_points(max_size_mm, x_offset, y_offset)
 
@@ -77,20 +113,107 @@ def generate_svg(document_size_x_mm, document_size_y_mm, elements):
     return svg_content
 
 
+# stroke colors of fabrication files, as most laser cutters expect them
+CUT_COLOR = "#ff0000"
+ENGRAVE_COLOR = "#0000ff"
+
+
+def write_fabrication_svg(file, α, geometry=BIG, document_size_x_mm=210, document_size_y_mm=297, label=None):
+    """
+    Streams the cut and engrave SVG of one pizza to file, a writable text file.
+        - α is the array of filter angles of the pizza, shaped (S, W), see Solution.α
+        - geometry is a (max_size_mm, circle_radius_mm, radii) triplet, as in GEOMETRIES
+        - label, if any, is engraved below the central window
+    The outline and windows are cut. Next to each window of a slice, a line is engraved along the axis of its filter, at
+    α degrees clockwise from the top of the pizza. Windows of the same angle share one definition, so files stay small.
+    """
+    α = np.asarray(α)
+    S, W = α.shape
+    max_size_mm, circle_radius_mm, radii = geometry
+    x_offset = document_size_x_mm / 2
+    y_offset = document_size_y_mm / 2
+    centers = compute_window_centers(S, max_size_mm, radii, x_offset, y_offset)
+    if centers.shape[1] != W:
+        raise ValueError(f"the geometry has {centers.shape[1]} windows per slice, the solution has {W}")
+
+    # windows of rings that are not part of any slice have no filter, they are only cut
+    holes = [[x_offset + max_size_mm * fraction / 2 * np.cos(2 * np.pi * np.arange(count) / count),
+              y_offset + max_size_mm * fraction / 2 * np.sin(2 * np.pi * np.arange(count) / count)]
+             for count, fraction in radii if count < S]
+    holes = np.concatenate(holes, axis=1).T if holes else np.zeros((0, 2))
+
+    r = circle_radius_mm
+    file.write(f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+               f'width="{document_size_x_mm}mm" height="{document_size_y_mm}mm" viewBox="0 0 {document_size_x_mm} {document_size_y_mm}">\n')
+    file.write(f'<style>.cut{{fill:none;stroke:{CUT_COLOR};stroke-width:0.1}}'
+               f'.engrave{{fill:none;stroke:{ENGRAVE_COLOR};stroke-width:0.3}}</style>\n<defs>\n')
+    file.write(f'<circle id="hole" class="cut" r="{r}"/>\n')
+    for angle in np.unique(α).tolist():
+        # the filter axis is marked outside the hole, which is cut away
+        file.write(f'<g id="filter-{angle}"><use xlink:href="#hole"/><path class="engrave" transform="rotate({angle})" '
+                   f'd="M0,{-1.5 * r:g}V{-1.2 * r:g}M0,{1.2 * r:g}V{1.5 * r:g}"/></g>\n')
+    file.write('</defs>\n')
+
+    file.write(f'<polygon class="cut" stroke-linejoin="round" points="{generate_octagon_star_points(max_size_mm, x_offset, y_offset)}"/>\n')
+    # an arrow above the central window points to slice 0, so that pizzas are stacked in the orientation they were solved for
+    file.write(f'<path class="engrave" d="M{x_offset:g},{y_offset - 2 * r:g}l{-0.3 * r:g},{0.6 * r:g}h{0.6 * r:g}z"/>\n')
+    if label is not None:
+        file.write(f'<text class="engrave" x="{x_offset:g}" y="{y_offset + 2.2 * r:g}" font-size="{0.6 * r:g}" '
+                   f'text-anchor="middle">{escape(label)}</text>\n')
+
+    file.writelines(f'<use xlink:href="#hole" x="{x:.3f}" y="{y:.3f}"/>\n' for x, y in holes.tolist())
+    file.writelines(f'<use xlink:href="#filter-{angle}" x="{x:.3f}" y="{y:.3f}"/>\n'
+                    for angle, (x, y) in zip(α.reshape(-1).tolist(), centers.reshape(-1, 2).tolist()))
+    file.write('</svg>\n')
+
+
+def export_fabrication(solution, directory, geometry=BIG, document_size_x_mm=210, document_size_y_mm=297, prefix="pizza"):
+    """
+    Writes one cut and engrave SVG per pizza of a Solution to directory, see write_fabrication_svg.
+
+    Returns the list of paths written, pizza i being written to {prefix}_{i}.svg
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, α in enumerate(np.asarray(solution.α)):
+        path = os.path.join(directory, f"{prefix}_{i}.svg")
+        with open(path, "w") as file:
+            write_fabrication_svg(file, α, geometry, document_size_x_mm, document_size_y_mm, label=f"{prefix} {i}")
+        paths.append(path)
+    return paths
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outputs SVG templates, or fabrication files of a solution")
+    parser.add_argument("--solution", help="JSON file of a solution, as written by Solution.to_dict or a checkpoint")
+    parser.add_argument("--output", default="fabrication", help="directory of the fabrication files")
+    parser.add_argument("--geometry", choices=list(GEOMETRIES), default="big", help="window layout of the pizzas")
+    parser.add_argument("--headless", action="store_true", help="do not open written files in a browser")
+    args = parser.parse_args()
+
+    if args.solution:
+        with open(args.solution) as solution_file:
+            d = json.load(solution_file)
+        solution = Solution.from_dict(d.get("solution", d))
+        for path in export_fabrication(solution, args.output, GEOMETRIES[args.geometry]):
+            print(path)
+        sys.exit(0)
+
     # small
     elements = []
-    elements.extend(generate_elements(95, 5, [[1, 0], [8, 13 / 32], [8, 23 / 32]], 210 / 4, 297 / 4))
-    elements.extend(generate_elements(95, 5, [[1, 0], [8, 13 / 32], [8, 23 / 32]], 210 / 4 * 3, 297 / 4))
-    elements.extend(generate_elements(95, 5, [[1, 0], [8, 13 / 32], [8, 23 / 32]], 210 / 4, 297 / 4 * 3))
-    elements.extend(generate_elements(95, 5, [[1, 0], [8, 13 / 32], [8, 23 / 32]], 210 / 4 * 3, 297 / 4 * 3))
+    elements.extend(generate_elements(*SMALL, 210 / 4, 297 / 4))
+    elements.extend(generate_elements(*SMALL, 210 / 4 * 3, 297 / 4))
+    elements.extend(generate_elements(*SMALL, 210 / 4, 297 / 4 * 3))
+    elements.extend(generate_elements(*SMALL, 210 / 4 * 3, 297 / 4 * 3))
     svg_content = generate_svg(210, 297, elements)
     with open("small.svg", 'w') as svg_file:
         svg_file.write(svg_content)
-    webbrowser.open("file://" + os.path.abspath("small.svg"), new=2)  # "new=2" opens the file in a new tab if possible
+    if not args.headless:
+        webbrowser.open("file://" + os.path.abspath("small.svg"), new=2)  # "new=2" opens the file in a new tab if possible
 
     # big
-    svg_content = generate_svg(210, 297, generate_elements(200, 5, [[1, 0], [8, 7 / 32], [8, 12 / 32], [16, 17 / 32], [16, 22 / 32], [8, 27 / 32],], 210 / 2, 297 / 2))
+    svg_content = generate_svg(210, 297, generate_elements(*BIG, 210 / 2, 297 / 2))
     with open("big.svg", 'w') as svg_file:
         svg_file.write(svg_content)
-    webbrowser.open("file://" + os.path.abspath("big.svg"), new=2)  # "new=2" opens the file in a new tab if possible
+    if not args.headless:
+        webbrowser.open("file://" + os.path.abspath("big.svg"), new=2)  # "new=2" opens the file in a new tab if possible
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from solver.solver import Problem, Solution
+
+
+def canonicalize(problem: Problem) -> (str, int, list[int]):
+    """
+    Computes a key identifying problem up to a rotation of all images by the same number of slices, and up to the order of
+    images.
+
+    Returns a triplet (key, r, order), where the canonical form c of problem is such that:
+        - c[t][j] = p[order[t]][(j + r) % S]
+    """
+    S = problem.S
+    p = problem.p
+
+    best = None
+    for r in range(S):
+        rotated = [tuple(tuple(p_m[(j + r) % S]) for j in range(S)) for p_m in p]
+        order = sorted(range(len(p)), key=lambda m: rotated[m])
+        images = [rotated[m] for m in order]
+        if best is None or images < best[0]:
+            best = (images, r, order)
+
+    images, r, order = best
+    encoded = json.dumps([problem.P, problem.S, problem.W, problem.A, problem.tolerance, images])
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest(), r, order
+
+
+class SolutionCache:
+    """Keeps solutions of problems on disk, sharing them among problems that only differ by rotation or image order."""
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+            directory is where solutions are stored, one JSON file per canonical problem
+            max_bytes is the maximum total size of stored solutions, least recently used ones are evicted first
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, problem: Problem, max_time_in_seconds: float = None) -> Solution:
+        """
+        Returns the cached Solution to problem, remapped to its rotation and image order, or None if there is none.
+
+        Unknown outcomes are only returned if they were recorded with at least max_time_in_seconds, if specified.
+        """
+        key, r, order = canonicalize(problem)
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        solution = Solution.from_dict(entry["solution"])
+        recorded_time = entry["max_time_in_seconds"]
+        if solution.success is None and None not in (max_time_in_seconds, recorded_time) and max_time_in_seconds > recorded_time:
+            return None
+        os.utime(path)
+
+        if not solution.success:
+            return solution
+        return Solution(solution.success, solution.wall_time, np.roll(solution.α, r, axis=1), solution.n[np.argsort(order)], solution.objective)
+
+    def put(self, problem: Problem, solution: Solution, max_time_in_seconds: float = None):
+        """
+        Stores solution to problem, including infeasible and unknown outcomes.
+
+        max_time_in_seconds is the time limit solution was found with, see get
+        """
+        key, r, order = canonicalize(problem)
+        entry = solution
+        if solution.success:
+            entry = Solution(solution.success, solution.wall_time, np.roll(solution.α, -r, axis=1), solution.n[order], solution.objective)
+
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False) as file:
+            json.dump({"max_time_in_seconds": max_time_in_seconds, "solution": entry.to_dict()}, file)
+        os.replace(file.name, self._path(key))
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    entries.append((os.stat(os.path.join(self.directory, name)), name))
+                except FileNotFoundError:
+                    pass
+
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, name in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
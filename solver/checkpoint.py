@@ -0,0 +1,150 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from ortools.sat.python import cp_model
+from solver.solver import CLASSIC, MISMATCHES, Cancellation, Model, ModelTemplateCache, Problem, Solution, SolverConfig, add_hint, build_model, solve_model
+
+
+class Checkpoint:
+    """Represents the progress of a resumable solve, see solve_resumable."""
+
+    def __init__(self, fingerprint: str, elapsed: float, solution: Solution = None, bound: int = None, done: bool = False):
+        """
+            fingerprint identifies the model being solved, see fingerprint()
+            elapsed is the total time spent solving so far, in seconds
+            solution is the best Solution found so far, if any
+            bound is the best proven lower bound on the objective, if any
+            done is True if the search was completed, ie. solution is optimal
+        """
+        self.fingerprint = fingerprint
+        self.elapsed = elapsed
+        self.solution = solution
+        self.bound = bound
+        self.done = done
+
+    def save(self, path: str):
+        """Writes this checkpoint to path, atomically replacing any previous one"""
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as file:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "elapsed": self.elapsed,
+                "solution": self.solution.to_dict() if self.solution is not None else None,
+                "bound": self.bound,
+                "done": self.done,
+            }, file)
+        os.replace(file.name, path)
+
+    @staticmethod
+    def load(path: str) -> "Checkpoint":
+        """Returns the checkpoint written to path, or None if there is none"""
+        try:
+            with open(path) as file:
+                d = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        solution = Solution.from_dict(d["solution"]) if d["solution"] is not None else None
+        return Checkpoint(d["fingerprint"], d["elapsed"], solution, d["bound"], d["done"])
+
+
+def fingerprint(built: Model) -> str:
+    """Returns a key identifying the model built, which changes if any variable or constraint changes"""
+    # text format is deterministic and, unlike binary serialization, available in all OR-Tools versions
+    return hashlib.sha256(str(built.model.Proto()).encode()).hexdigest()
+
+
+def solve_resumable(problem: Problem, path: str, objective: str = MISMATCHES, max_time_in_seconds: float = 6000, interval: float = 60, formulation: str = CLASSIC, symmetry_breaking: bool = False, templates: ModelTemplateCache = None, config: SolverConfig = None, cancellation: Cancellation = None) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon as solve_soft does, checkpointing progress to path.
+
+    A hard model has no intermediate assignments, so the soft model is solved instead: its best solution is the best
+    partial assignment, reproducing all pixels but those counted by objective.
+
+    If path holds a checkpoint of the same model, the search resumes from it:
+        - the best solution found so far hints the search, and the objective is bounded by its value
+        - the objective is bounded from below by the best bound proven so far
+        - the search only runs for the time remaining from max_time_in_seconds
+    A checkpoint of a different model, eg. for different images, raises ValueError.
+
+    No variable is fixed on resume, not even offsets n of images the best solution reproduces exactly: a better
+    solution may need other offsets for them, and bounds proven on the restricted model would not hold for the full one,
+    so an unknown outcome could be checkpointed as proven infeasible. Only the objective bounds are proven facts about
+    the full model. Clauses learned by CP-SAT cannot be exported, so they are lost between runs.
+
+    interval is the period of checkpoints, in seconds, new solutions are also checkpointed as they are found
+    other parameters are as in solve_soft()
+
+    Returns the best Solution found across all runs, as solve_soft() does. wall_time includes previous runs.
+    """
+    built = build_model(problem, formulation, symmetry_breaking, templates, objective)
+    key = fingerprint(built)
+
+    checkpoint = Checkpoint.load(path)
+    if checkpoint is None:
+        checkpoint = Checkpoint(key, 0.0)
+    elif checkpoint.fingerprint != key:
+        raise ValueError(f"{path} is a checkpoint of a different model")
+    if checkpoint.done or checkpoint.elapsed >= max_time_in_seconds:
+        return _result(checkpoint)
+
+    proto_objective = built.model.Proto().objective
+    objective_expression = cp_model.LinearExpr.WeightedSum(
+        [built.model.GetIntVarFromProtoIndex(v) for v in proto_objective.vars], list(proto_objective.coeffs))
+    if checkpoint.solution is not None:
+        add_hint(built, checkpoint.solution)
+        built.model.Add(objective_expression <= checkpoint.solution.objective)
+    if checkpoint.bound is not None:
+        built.model.Add(objective_expression >= checkpoint.bound)
+
+    lock = threading.Lock()
+    start = time.monotonic()
+    previous_elapsed = checkpoint.elapsed
+
+    def save(solution: Solution = None, done: bool = False):
+        with lock:
+            checkpoint.elapsed = previous_elapsed + time.monotonic() - start
+            if solution is not None and solution.objective is not None:
+                checkpoint.solution = solution
+            if solution is not None and solution.telemetry is not None and solution.telemetry.bound is not None:
+                # objectives are integers, so fractional bounds can be rounded up
+                checkpoint.bound = max(checkpoint.bound or 0, math.ceil(solution.telemetry.bound - 1e-6))
+            checkpoint.done = done
+            checkpoint.save(path)
+
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            save()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        config = (config or SolverConfig()).replace(max_time_in_seconds=max_time_in_seconds - previous_elapsed)
+        solution = solve_model(built, problem, config, save, cancellation=cancellation)
+    finally:
+        stop.set()
+        thread.join()
+
+    # unknown outcomes can be resumed with more time
+    save(solution, done=solution.success is not None)
+    return _result(checkpoint)
+
+
+def _result(checkpoint: Checkpoint) -> Solution:
+    """Returns the Solution recorded by checkpoint, with success as solve_soft() returns it"""
+    solution = checkpoint.solution
+    if solution is None:
+        return Solution(None, checkpoint.elapsed, [], [])
+
+    success = None
+    if solution.objective == 0:
+        success = True
+    elif checkpoint.bound is not None and checkpoint.bound >= solution.objective:
+        # the best solution was proven optimal, and it does not reproduce all pixels
+        success = False
+    return Solution(success, checkpoint.elapsed, solution.α, solution.n, solution.objective)
@@ -0,0 +1,203 @@
+import itertools
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from ortools.sat.python import cp_model
+from solver.solver import Problem, Solution, compute_automaton, compute_valid_angles, rotations_preserve_angles
+
+
+def compute_pieces(problem: Problem, n: list[list[int]]) -> list[(int, list[(int, int)], list[(int, list[(int, int)])])]:
+    """
+    Splits an Opticon problem with fixed offsets into independent pieces.
+
+    Once n[m][i] is fixed for images 0..len(n)-1, every pixel p[m][j][k] only depends on the filters at window k of the
+    slices that end up stacked at slice j. Pixels sharing at least one filter form an orbit, different orbits and
+    different windows do not interact.
+
+    Returns a list of triplets (k, filters, constraints):
+        - k is the window the piece belongs to
+        - filters is the list of (i, j) filters in the piece, ie. α[i][j][k] values
+        - constraints is a list of (end_state, [(filter index, angle offset) for each pizza]) one per pixel
+    """
+    P = problem.P
+    S = problem.S
+    W = problem.W
+    p = problem.p
+    offset = math.floor(360.0 / S)
+
+    pieces = []
+    for k in range(W):
+        # union-find over filters (i, j), with pixels joining all filters stacked on them
+        parent = {}
+
+        def find(x):
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        pixels = []
+        for m in range(len(n)):
+            for j in range(S):
+                filters = [(i, (j - n[m][i]) % S) for i in range(P)]
+                for f in filters[1:]:
+                    parent[find(f)] = find(filters[0])
+                pixels.append((p[m][j][k], filters, [(offset * n[m][i]) % 180 for i in range(P)]))
+
+        orbits = {}
+        for end_state, filters, offsets in pixels:
+            orbit_filters, orbit_constraints = orbits.setdefault(find(filters[0]), ({}, []))
+            chain = []
+            for f, o in zip(filters, offsets):
+                chain.append((orbit_filters.setdefault(f, len(orbit_filters)), o))
+            orbit_constraints.append((end_state, chain))
+
+        for orbit_filters, orbit_constraints in orbits.values():
+            pieces.append((k, list(orbit_filters), orbit_constraints))
+
+    return pieces
+
+
+def solve_piece(A: int, P: int, filter_count: int, constraints: list[(int, list[(int, int)])], tolerance: int = 0, S: int = None, max_time_in_seconds: float = None) -> list[int]:
+    """
+    Finds angles for the filters of a piece computed by compute_pieces, with end energies within tolerance.
+
+    S is the count of slices the angle offsets of constraints come from, see compute_valid_deltas
+    max_time_in_seconds bounds the search, if not None, after which TimeoutError is raised
+
+    Returns the list of angles, one per filter, or None if the piece is infeasible.
+    """
+    model = cp_model.CpModel()
+
+    valid_angles = compute_valid_angles(A)
+    α_domain = cp_model.Domain.FromValues(valid_angles)
+    α = [model.NewIntVarFromDomain(α_domain, f"α[{f}]") for f in range(filter_count)]
+
+    # with offsets fixed, the angle delta only depends on the two filters involved
+    for end_state, chain in constraints:
+        automaton = compute_automaton(A, P, range(end_state - tolerance, end_state + tolerance + 1), S)
+        if automaton is None:
+            return None
+        D = []
+        for i in range(1, P):
+            f_under, o_under = chain[i - 1]
+            f_over, o_over = chain[i]
+            D_i = model.NewIntVar(0, 180, "")
+            model.AddAllowedAssignments([α[f_over], α[f_under], D_i], [
+                (a_over, a_under, (a_over + o_over - a_under - o_under) % 180)
+                for a_over in valid_angles for a_under in valid_angles
+            ])
+            D.append(D_i)
+        start_state, final_states, transitions = automaton
+        model.AddAutomaton(D, start_state, final_states, transitions)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = 1
+    # pieces are small enough that presolve costs more than it saves
+    solver.parameters.cp_model_presolve = False
+    if max_time_in_seconds is not None:
+        solver.parameters.max_time_in_seconds = max_time_in_seconds
+
+    status = solver.Solve(model)
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        return [solver.Value(α_f) for α_f in α]
+    elif status == cp_model.INFEASIBLE:
+        return None
+    elif status == cp_model.UNKNOWN:
+        raise TimeoutError()
+    raise RuntimeError(f"unexpected status solving piece: {solver.StatusName(status)}")
+
+
+def _canonical(piece) -> (int, tuple):
+    """Returns a key identifying a piece independently of its window and filter positions, so results can be reused"""
+    _, filters, constraints = piece
+    return len(filters), tuple((end_state, tuple(chain)) for end_state, chain in constraints)
+
+
+def solve_decomposed(problem: Problem, workers: int = None, max_time_in_seconds: float = 6000) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon by decomposition.
+
+    Offsets n[m] are branched upon one image at a time. Each partial assignment is split by compute_pieces into small
+    independent subproblems, solved in parallel by a pool of worker processes. An assignment is rejected as soon as any
+    of its pieces turns out infeasible, pruning all assignments extending it.
+
+    workers is the number of processes in the pool (defaults to the CPU count)
+    max_time_in_seconds bounds the total search time, after which the result is unknown
+
+    Returns a Solution as solve() does.
+    """
+    start = time.monotonic()
+    P = problem.P
+    S = problem.S
+    W = problem.W
+    A = problem.A
+    M = len(problem.p)
+
+    rows = [[0] + list(row) for row in itertools.product(range(S), repeat=P - 1)]
+    # rotating a whole pizza can be undone by its offsets, so offsets for image 0 can be assumed to be 0
+    first_rows = [[0] * P] if rotations_preserve_angles(S, A) else rows
+    results = {}
+
+    def feasible(executor, n) -> bool:
+        """Solves all pieces for the partial assignment n, reusing results of identical pieces seen before"""
+        unknown = {}
+        for piece in compute_pieces(problem, n):
+            key = _canonical(piece)
+            if key not in results:
+                unknown[key] = piece
+            elif results[key] is None:
+                return False
+
+        timeout = max_time_in_seconds - (time.monotonic() - start)
+        if timeout <= 0:
+            raise TimeoutError()
+        # pieces stop at the deadline too, so that none outlives the search
+        pending = {executor.submit(solve_piece, A, P, key[0], piece[2], problem.tolerance, S, timeout): key for key, piece in unknown.items()}
+
+        while pending:
+            timeout = max_time_in_seconds - (time.monotonic() - start)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                for future in pending:
+                    future.cancel()
+                raise TimeoutError()
+            for future in done:
+                key = pending.pop(future)
+                results[key] = future.result()
+                if results[key] is None:
+                    for future in pending:
+                        future.cancel()
+                    return False
+        return True
+
+    success = None
+    n = None
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # depth-first search over rows of n, one image at a time
+        stack = [[row] for row in reversed(first_rows)]
+        success = False
+        while stack:
+            n = stack.pop()
+            if not feasible(executor, n):
+                continue
+            if len(n) == M:
+                success = True
+                break
+            stack.extend(n + [row] for row in reversed(rows))
+    except TimeoutError:
+        success = None
+    finally:
+        # pieces not started yet are dropped, running ones return by the deadline
+        executor.shutdown(cancel_futures=True)
+
+    α = []
+    if success:
+        α = [[[0] * W for _ in range(S)] for _ in range(P)]
+        for k, filters, constraints in compute_pieces(problem, n):
+            angles = results[_canonical((k, filters, constraints))]
+            for (i, j), angle in zip(filters, angles):
+                α[i][j][k] = angle
+
+    return Solution(success, time.monotonic() - start, α, n if success else [])
@@ -0,0 +1,166 @@
+import itertools
+import time
+from ortools.sat.python import cp_model
+from solver.solver import CLASSIC, TEMPLATES, Model, ModelTemplateCache, Problem, SolverConfig, add_soft_automaton, solve_many
+
+# granularities of explanations, see explain
+IMAGES = "images"
+WINDOWS = "windows"
+PIXELS = "pixels"
+BLOCKS = [IMAGES, WINDOWS, PIXELS]
+
+
+class Explanation:
+    """Represents a set of pixel constraints of an Opticon problem that cannot all be satisfied."""
+
+    def __init__(self, feasible: bool, core: list[tuple], minimal: bool):
+        """
+            feasible is False if core was found, True if the problem has solutions, None if it is not known
+            core is the list of blocks of pixels that together make the problem infeasible, each block being:
+                - (m,) for all pixels of image m, if explaining by IMAGES
+                - (m, k) for pixels of window k in image m, if explaining by WINDOWS
+                - (m, j, k) for pixel p[m][j][k], if explaining by PIXELS
+            minimal is True if dropping any block of core was proven to make it feasible
+        """
+        self.feasible = feasible
+        self.core = core
+        self.minimal = minimal
+
+
+def explain(problem: Problem, blocks: str = IMAGES, max_subset_size: int = 3, workers: int = None, fast_time_in_seconds: float = 60, formulation: str = CLASSIC, templates: ModelTemplateCache = None, config: SolverConfig = None) -> Explanation:
+    """
+    Finds out which pixels make an Opticon problem infeasible.
+
+    First, all subsets of up to max_subset_size images are solved in parallel, smallest first, by a pool of workers
+    processes, as in solve_many. The first infeasible subset found is the explanation by IMAGES, and it is minimal if all
+    smaller subsets were proven feasible. Conflicts usually involve few images, so this is often enough.
+
+    Otherwise, or to explain by finer blocks, pixel constraints of the remaining images are guarded by one assumption
+    literal per block and solved at once, see _find_core. CP-SAT reports the assumptions its proof of infeasibility
+    used, and blocks are then dropped one at a time while the rest stays infeasible.
+
+    blocks is the granularity of the explanation, one of IMAGES, WINDOWS or PIXELS
+    max_subset_size is the largest number of images solved together before solving all, 0 to skip that step
+    workers is the number of processes solving subsets (defaults to the CPU count)
+    fast_time_in_seconds bounds the time spent solving subsets
+    formulation and templates are as in build_model
+    config is the SolverConfig of guarded solves (defaults to SolverConfig()), its time limit bounds them all together
+    """
+    if blocks not in BLOCKS:
+        raise ValueError(f"unknown blocks {blocks}, expected one of {BLOCKS}")
+
+    images = list(range(len(problem.p)))
+    subset, minimal = _find_infeasible_subset(problem, max_subset_size, workers, fast_time_in_seconds)
+    if subset is not None:
+        if blocks == IMAGES:
+            return Explanation(False, [(m,) for m in subset], minimal)
+        images = subset
+
+    restricted = Problem(problem.P, problem.S, problem.W, problem.A, [problem.p[m] for m in images], problem.tolerance)
+    feasible, core, minimal = _find_core(restricted, blocks, formulation, templates, config or SolverConfig())
+    return Explanation(feasible, [(images[block[0]],) + block[1:] for block in core], minimal)
+
+
+def _find_infeasible_subset(problem: Problem, max_subset_size: int, workers: int, max_time_in_seconds: float) -> (list[int], bool):
+    """Returns the first infeasible subset of images found, smallest first, and whether it is minimal, or (None, False)"""
+    deadline = time.monotonic() + max_time_in_seconds
+    smaller_feasible = True
+    for size in range(1, min(max_subset_size, len(problem.p)) + 1):
+        subsets = {}
+
+        def problems():
+            for subset in itertools.combinations(range(len(problem.p)), size):
+                if time.monotonic() >= deadline:
+                    return
+                subproblem = Problem(problem.P, problem.S, problem.W, problem.A, [problem.p[m] for m in subset], problem.tolerance)
+                subsets[subproblem] = list(subset)
+                yield subproblem
+
+        all_feasible = True
+        results = solve_many(problems(), workers, per_problem_timeout=max(0.0, deadline - time.monotonic()))
+        try:
+            for subproblem, solution in results:
+                if isinstance(solution, Exception):
+                    raise solution
+                if solution.success is False:
+                    return subsets[subproblem], smaller_feasible
+                all_feasible = all_feasible and solution.success is True
+        finally:
+            results.close()
+        if time.monotonic() >= deadline:
+            break
+        smaller_feasible = smaller_feasible and all_feasible
+    return None, False
+
+
+def _find_core(problem: Problem, blocks: str, formulation: str, templates: ModelTemplateCache, config: SolverConfig) -> (bool, list[tuple], bool):
+    """
+    Finds an infeasible core of guarded pixel constraints, see explain.
+
+    Returns a triplet (feasible, core, minimal) as in Explanation.
+    """
+    built, guards = _build_guarded_model(problem, blocks, formulation, templates)
+    model = built.model
+    deadline = time.monotonic() + config.max_time_in_seconds
+
+    def check(candidate: list[tuple]) -> (bool, list[tuple]):
+        """Solves with candidate blocks enforced, returning success and, if infeasible, the blocks the proof used"""
+        model.ClearAssumptions()
+        model.AddAssumptions([guards[block] for block in candidate])
+        solver = cp_model.CpSolver()
+        config.replace(max_time_in_seconds=max(0.0, deadline - time.monotonic()), log_search_progress=False).apply(solver)
+        status = solver.Solve(model)
+        if status == cp_model.INFEASIBLE:
+            used = set(solver.SufficientAssumptionsForInfeasibility())
+            return False, [block for block in candidate if guards[block].Index() in used] or candidate
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            return True, []
+        return None, []
+
+    feasible, core = check(list(guards))
+    if feasible is not False:
+        return feasible, [], False
+
+    # a block is necessary if the core is feasible without it, then it stays necessary in all smaller cores
+    necessary = []
+    minimal = True
+    while core:
+        block = core.pop(0)
+        feasible, smaller = check(necessary + core)
+        if feasible is False:
+            smaller = set(smaller)
+            core = [b for b in core if b in smaller]
+        else:
+            necessary.append(block)
+            minimal = minimal and feasible is True
+    return False, necessary, minimal
+
+
+def _build_guarded_model(problem: Problem, blocks: str, formulation: str, templates: ModelTemplateCache) -> (Model, dict):
+    """
+    Builds a model of problem whose pixel constraints only hold if the literal guarding their block is true.
+
+    Automata cannot be enforced conditionally, so each one reads the end energy as soft models do, see
+    add_soft_automaton, and the end energy is constrained to be within tolerance of the pixel only if its guard is true.
+
+    Returns a pair (built, guards), guards mapping each block to its literal.
+    """
+    P = problem.P
+    S = problem.S
+    W = problem.W
+    A = problem.A
+    p = problem.p
+    tolerance = problem.tolerance
+
+    built = (templates or TEMPLATES).get(P, S, W, A, len(p), formulation, False).instantiate()
+    model = built.model
+    guards = {}
+    for m in range(len(p)):
+        for j in range(S):
+            for k in range(W):
+                block = {IMAGES: (m,), WINDOWS: (m, k), PIXELS: (m, j, k)}[blocks]
+                if block not in guards:
+                    guards[block] = model.NewBoolVar(f"guard{list(block)}")
+                targets = range(p[m][j][k] - tolerance, p[m][j][k] + tolerance + 1)
+                add_soft_automaton(model, built.D[j][k][m][1:], A, P, S, f"E[{m}][{j}][{k}]", targets, guards[block])
+    return built, guards
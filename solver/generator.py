@@ -0,0 +1,53 @@
+import numpy as np
+from solver.solver import Problem, Solution, compute_energy_levels, compute_valid_angles
+from solver.verifier import simulate
+
+
+def generate(P: int, S: int, W: int, A: int, M: int, seed: int = None, perturbation: float = 0.0) -> (Problem, Solution):
+    """
+    Generates a random Opticon problem with a planted solution.
+
+    Angles α and offsets n are drawn uniformly at random, images are the ones they reproduce according to simulate, so
+    the problem is feasible by construction.
+
+    seed makes the generated problem reproducible, if not None
+    perturbation is the fraction of pixels to change afterwards, see perturb
+
+    Returns a pair (problem, solution), where solution is the planted one. It solves problem only if perturbation is 0.
+    """
+    rng = np.random.default_rng(seed)
+    α = rng.choice(compute_valid_angles(A), size=(P, S, W))
+    n = rng.integers(0, S, size=(M, P))
+    # pizza 0 is never rotated
+    n[:, 0] = 0
+
+    problem = Problem(P, S, W, A, simulate(α, n).tolist())
+    if perturbation > 0:
+        problem = perturb(problem, perturbation, rng)
+    return problem, Solution(True, 0.0, α, n)
+
+
+def perturb(problem: Problem, fraction: float, rng: np.random.Generator = None) -> Problem:
+    """
+    Returns a copy of problem with a fraction of its pixels moved to an adjacent reachable energy level.
+
+    Changed pixels are picked uniformly at random, and each moves one level up or down among the energies reachable by
+    the pizzas of problem, so the result stays close to the original images. A small fraction typically yields problems
+    that are just barely infeasible, or feasible only through a very different solution.
+
+    rng is the random generator to use (defaults to a new, unseeded one)
+    """
+    rng = rng or np.random.default_rng()
+    levels = np.array(compute_energy_levels(problem.A, problem.P, problem.S)[-1])
+    p = np.array(problem.p)
+
+    count = round(fraction * p.size)
+    pixels = rng.choice(p.size, size=count, replace=False)
+    positions = np.searchsorted(levels, p.flat[pixels])
+    # move up or down, towards the only neighbor for the lowest and highest levels
+    steps = rng.choice([-1, 1], size=count)
+    steps[positions == 0] = 1
+    steps[positions == len(levels) - 1] = -1
+    p.flat[pixels] = levels[np.clip(positions + steps, 0, len(levels) - 1)]
+
+    return Problem(problem.P, problem.S, problem.W, problem.A, p.tolist(), problem.tolerance)
@@ -0,0 +1,75 @@
+import itertools
+import time
+import numpy as np
+from solver.solver import CLASSIC, Cancellation, ModelTemplateCache, Problem, Solution, SolverConfig, solve
+from solver.verifier import simulate
+
+
+def find_offsets(problem: Problem, α, images: list[int]) -> (np.ndarray, np.ndarray):
+    """
+    Finds the offsets reproducing each of images best with fixed angles α, by trying all of them.
+
+    With α fixed, images do not interact: the energies of every row of offsets are simulated once, then compared to each
+    image. Pizza 0 is never rotated, so there are S^(P-1) rows to try.
+
+    Returns a pair (n, errors):
+        - n[t] is the best row of offsets for image images[t], shaped (P,)
+        - errors[t] is its total pixel error beyond the tolerance of problem, 0 if the image is reproduced
+    """
+    rows = np.array([(0,) + row for row in itertools.product(range(problem.S), repeat=problem.P - 1)], dtype=np.int32)
+    # energies[r] are the energies obtained with offsets rows[r], shaped (S, W)
+    energies = simulate(α, rows[:, None, :])[:, 0]
+
+    n = np.zeros((len(images), problem.P), dtype=np.int32)
+    errors = np.zeros(len(images), dtype=np.int64)
+    for t, m in enumerate(images):
+        row_errors = np.maximum(np.abs(energies - np.asarray(problem.p[m])) - problem.tolerance, 0).sum(axis=(1, 2))
+        best = np.argmin(row_errors)
+        n[t] = rows[best]
+        errors[t] = row_errors[best]
+    return n, errors
+
+
+def solve_lazy(problem: Problem, initial_images: int = 1, batch: int = 1, formulation: str = CLASSIC, symmetry_breaking: bool = False, templates: ModelTemplateCache = None, config: SolverConfig = None, cancellation: Cancellation = None) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon, modeling as few images as possible.
+
+    The model is first built for the first initial_images images only. Angles α of each solution are then checked
+    against the other images with find_offsets, which is cheap as it does not involve the model. Images that cannot be
+    reproduced with α are added to the model, the batch worst ones at a time, and the model is solved again starting
+    from α. Often a few hard images decide the whole set, so the model stays much smaller than with all images.
+
+    If a subset of images is infeasible, so is the whole problem.
+
+    config is the SolverConfig to use (defaults to SolverConfig()), its time limit bounds all solves together
+    other parameters are as in solve()
+
+    Returns a Solution as solve() does.
+    """
+    start = time.monotonic()
+    config = config or SolverConfig()
+    M = len(problem.p)
+    active = list(range(min(max(initial_images, 1), M)))
+    hint = None
+
+    while True:
+        remaining = config.max_time_in_seconds - (time.monotonic() - start)
+        if remaining <= 0:
+            return Solution(None, time.monotonic() - start, [], [])
+        subset = Problem(problem.P, problem.S, problem.W, problem.A, [problem.p[m] for m in active], problem.tolerance)
+        solution = solve(subset, formulation, symmetry_breaking, templates, hint, config.replace(max_time_in_seconds=remaining), cancellation=cancellation)
+        if not solution.success:
+            return Solution(solution.success, time.monotonic() - start, [], [])
+
+        others = [m for m in range(M) if m not in active]
+        n_others, errors = find_offsets(problem, solution.α, others)
+        if not errors.any():
+            n = np.zeros((M, problem.P), dtype=np.int32)
+            n[active] = solution.n
+            n[others] = n_others
+            return Solution(True, time.monotonic() - start, solution.α, n)
+
+        # the worst images are added, the search starting from the closest offsets found for them
+        worst = np.argsort(-errors, kind="stable")[:min(batch, np.count_nonzero(errors))]
+        active.extend(others[t] for t in worst)
+        hint = Solution(None, 0, solution.α, np.concatenate([solution.n, n_others[worst]]))
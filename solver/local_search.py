@@ -0,0 +1,125 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from solver.solver import Problem, Solution, SolverConfig, compute_valid_angles, solve
+from solver.verifier import simulate
+
+
+def anneal(problem: Problem, seed: int, max_time_in_seconds: float, initial_temperature: float = 100.0, final_temperature: float = 5.0, stop=None) -> (int, np.ndarray, np.ndarray):
+    """
+    Searches for α and n minimizing the total pixel error, beyond the tolerance of problem, with simulated annealing.
+
+    Moves change either the angle of one filter or the offset of one pizza in one image. Only the pixels a move can
+    affect are simulated again: one window across all images for angle moves, one image for offset moves.
+    The temperature decreases geometrically from initial_temperature to final_temperature over the time budget.
+    stop is an Event ending the search early once set, eg. because another chain found a solution
+
+    Returns the best (total error, α, n) found, stopping early if the error reaches 0.
+    """
+    start = time.monotonic()
+    rng = np.random.default_rng(seed)
+    P = problem.P
+    S = problem.S
+    W = problem.W
+    p = np.asarray(problem.p)
+    M = len(p)
+    valid_angles = np.array(compute_valid_angles(problem.A))
+
+    α = rng.choice(valid_angles, size=(P, S, W))
+    n = rng.integers(0, S, size=(M, P))
+    n[:, 0] = 0
+
+    def pixel_errors(energies, pixels):
+        """Returns distances of energies from pixels, beyond the tolerance of problem"""
+        return np.maximum(np.abs(energies - pixels) - problem.tolerance, 0)
+
+    # window_errors[k] and image_errors[m] are the total errors of window k and image m
+    errors = pixel_errors(simulate(α, n), p)
+    window_errors = errors.sum(axis=(0, 1))
+    image_errors = errors.sum(axis=(1, 2))
+    error = int(errors.sum())
+
+    best = (error, α.copy(), n.copy())
+    temperature = initial_temperature
+    iteration = 0
+    while best[0] > 0:
+        iteration += 1
+        if iteration % 100 == 0:
+            elapsed = time.monotonic() - start
+            if elapsed >= max_time_in_seconds or (stop is not None and stop.is_set()):
+                break
+            temperature = initial_temperature * math.pow(final_temperature / initial_temperature, elapsed / max_time_in_seconds)
+
+        if P == 1 or rng.random() < 0.5:
+            i, j, k = rng.integers(P), rng.integers(S), rng.integers(W)
+            previous = α[i, j, k]
+            α[i, j, k] = rng.choice(valid_angles)
+            new_window_errors = pixel_errors(simulate(α[:, :, k:k + 1], n), p[:, :, k:k + 1])
+            delta = int(new_window_errors.sum()) - int(window_errors[k])
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                window_errors[k] += delta
+                image_errors += new_window_errors.sum(axis=(1, 2)) - errors[:, :, k].sum(axis=1)
+                errors[:, :, k] = new_window_errors[:, :, 0]
+                error += delta
+            else:
+                α[i, j, k] = previous
+        else:
+            m, i = rng.integers(M), rng.integers(1, P)
+            previous = n[m, i]
+            n[m, i] = rng.integers(S)
+            new_image_errors = pixel_errors(simulate(α, n[m:m + 1]), p[m:m + 1])
+            delta = int(new_image_errors.sum()) - int(image_errors[m])
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                image_errors[m] += delta
+                window_errors += new_image_errors.sum(axis=(0, 1)) - errors[m].sum(axis=0)
+                errors[m] = new_image_errors[0]
+                error += delta
+            else:
+                n[m, i] = previous
+
+        if error < best[0]:
+            best = (error, α.copy(), n.copy())
+
+    return best
+
+
+def search(problem: Problem, max_time_in_seconds: float = 60, chains: int = None, seed: int = 0, refine: bool = False, config: SolverConfig = None) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon by local search, for instances CP-SAT cannot finish.
+
+    chains is the number of independent annealing chains, each run in its own process (defaults to the CPU count)
+        - all chains stop as soon as one finds a solution
+    seed makes results reproducible, chain c uses seed + c
+    refine passes the best assignment found as a hint to solve() if it is not a solution already
+    config is the SolverConfig of the refining solve (defaults to one limited to max_time_in_seconds)
+
+    Returns a Solution as solve() does. Local search cannot prove infeasibility, so success is None unless a solution
+    is found. α and n hold the best assignment found in either case.
+    """
+    start = time.monotonic()
+    if chains is None:
+        chains = os.cpu_count()
+
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=chains) as executor:
+        stop = manager.Event()
+        futures = [executor.submit(anneal, problem, seed + c, max_time_in_seconds, stop=stop) for c in range(chains)]
+        error = None
+        for future in as_completed(futures):
+            result = future.result()
+            if error is None or result[0] < error:
+                error, α, n = result
+            if error == 0:
+                stop.set()
+                for other in futures:
+                    other.cancel()
+                break
+
+    solution = Solution(True if error == 0 else None, time.monotonic() - start, α, n)
+    if refine and not solution.success:
+        refined = solve(problem, hint=solution, config=config or SolverConfig(max_time_in_seconds=max_time_in_seconds))
+        refined.wall_time += solution.wall_time
+        return refined
+    return solution
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Serves solves of Opticon problems over HTTP, from a long-running process.
+
+Run from the repository root with:
+
+    python -m solver.service --port 8765 --workers 2
+
+Endpoints, all exchanging JSON:
+    POST /jobs              submits problems, see SolveService.parse, returns {"jobs": [job, ...]}
+    GET /jobs               returns {"jobs": [job, ...]} of all known jobs
+    GET /jobs/ID            returns a job, see Job.to_dict
+    GET /jobs/ID/events     streams events of a job as JSON lines, until it finishes, see Job.events
+    DELETE /jobs/ID         cancels a job, returning it
+
+Problems can be posted as one JSON document, or as JSON lines such as the ones printed by ingest.py.
+"""
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from solver.cache import SolutionCache
+from solver.solver import OBJECTIVES, Cancellation, ModelTemplateCache, Problem, Solution, SolverConfig, solve, solve_soft
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+# statuses of jobs that will not change anymore
+FINISHED = (DONE, CANCELLED, FAILED)
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class Job:
+    """Represents a problem submitted to a SolveService, and the progress of its solve."""
+
+    def __init__(self, id: str, key: str, problem: Problem, objective: str = None, max_time_in_seconds: float = None, name: str = None):
+        """
+            id identifies the job in the service
+            key identifies the problem and solve options, jobs with the same key have the same outcome
+            problem is the Problem to solve
+            objective makes the solve soft, as in solve_soft, if not None
+            max_time_in_seconds overrides the time limit of the service, if not None
+            name is an optional label chosen by the client
+        """
+        self.id = id
+        self.key = key
+        self.problem = problem
+        self.objective = objective
+        self.max_time_in_seconds = max_time_in_seconds
+        self.name = name
+        self.status = QUEUED
+        # the latest Solution, intermediate while running and final once done
+        self.solution = None
+        self.error = None
+        # history of to_dict() snapshots, one per change, so that streams can replay it
+        self.events = []
+        self.cancellation = Cancellation()
+        self.changed = asyncio.Event()
+        self._update(QUEUED)
+
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable representation of this job"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "solution": self.solution.to_dict() if self.solution is not None else None,
+            "error": self.error,
+        }
+
+    def _update(self, status: str, solution: Solution = None, error: str = None):
+        """Records a change, waking up streams waiting for it. Must be called from the event loop thread"""
+        self.status = status
+        if solution is not None:
+            self.solution = solution
+        self.error = error
+        self.events.append(self.to_dict())
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SolveService:
+    """Queues problems, solving them in a bounded pool of threads that share model templates and solutions."""
+
+    def __init__(self, workers: int = 1, config: SolverConfig = None, templates: ModelTemplateCache = None, cache: SolutionCache = None, max_jobs: int = 1024):
+        """
+            workers is the number of problems solved at the same time
+            config is the SolverConfig of each solve (defaults to sharing all cores among workers)
+            templates is the cache of model templates, shared by all solves (defaults to a new one)
+            cache is the SolutionCache of hard solves, if any, which outlives the service
+            max_jobs is the maximum number of finished jobs remembered, oldest ones are forgotten first
+        """
+        self.workers = workers
+        self.config = config or SolverConfig(num_workers=max(1, (os.cpu_count() or 1) // workers))
+        self.templates = templates or ModelTemplateCache()
+        self.cache = cache
+        self.max_jobs = max_jobs
+        self.jobs = collections.OrderedDict()
+        self.keys = {}
+        self.ids = itertools.count()
+        self.queue = None
+        self.tasks = []
+        self.executor = None
+
+    async def start(self):
+        """Starts workers, must be called from the event loop serving requests"""
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Cancels all jobs, and waits for running solves to return"""
+        for job in self.jobs.values():
+            self.cancel(job.id)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+    def submit(self, problem: Problem, objective: str = None, max_time_in_seconds: float = None, name: str = None) -> Job:
+        """
+        Queues a solve of problem, see Job for parameters.
+
+        Returns the job with the same problem and options if one is queued, running or done, a new Job otherwise.
+        """
+        if objective is not None and objective not in OBJECTIVES:
+            raise ValueError(f"unknown objective {objective}, expected one of {OBJECTIVES}")
+        encoded = json.dumps([problem.to_dict(), objective, max_time_in_seconds], sort_keys=True)
+        key = hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+        job = self.keys.get(key)
+        if job is not None and job.status in (QUEUED, RUNNING, DONE):
+            return job
+
+        job = Job(str(next(self.ids)), key, problem, objective, max_time_in_seconds, name)
+        self.jobs[job.id] = job
+        self.keys[key] = job
+        self.queue.put_nowait(job)
+        self._forget()
+        return job
+
+    def cancel(self, id: str) -> Job:
+        """Cancels a job, running ones return the best Solution found so far. Returns the job, or None if unknown"""
+        job = self.jobs.get(id)
+        if job is None:
+            return None
+        job.cancellation.cancel()
+        if job.status == QUEUED:
+            job._update(CANCELLED)
+        return job
+
+    def _forget(self):
+        finished = [job for job in self.jobs.values() if job.status in FINISHED]
+        for job in finished[:max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job.id]
+            if self.keys.get(job.key) is job:
+                del self.keys[job.key]
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.status != QUEUED:
+                continue
+            job._update(RUNNING)
+            try:
+                solution = await loop.run_in_executor(self.executor, self._solve, job, loop)
+            except Exception as e:
+                job._update(FAILED, error=str(e))
+                continue
+            job._update(CANCELLED if job.cancellation.cancelled else DONE, solution)
+            self._forget()
+
+    def _solve(self, job: Job, loop: asyncio.AbstractEventLoop) -> Solution:
+        """Solves the problem of job, runs in a worker thread"""
+        def on_solution(solution: Solution):
+            loop.call_soon_threadsafe(job._update, RUNNING, solution)
+
+        config = self.config
+        if job.max_time_in_seconds is not None:
+            config = config.replace(max_time_in_seconds=job.max_time_in_seconds)
+        if job.objective is not None:
+            return solve_soft(job.problem, job.objective, config.max_time_in_seconds, on_solution=on_solution, templates=self.templates, config=config, cancellation=job.cancellation)
+        return solve(job.problem, templates=self.templates, config=config, cache=self.cache, on_solution=on_solution, cancellation=job.cancellation)
+
+    @staticmethod
+    def parse(body: bytes) -> list[dict]:
+        """
+        Parses submitted problems, from a JSON document or JSON lines. Each item is either:
+            - a problem, as returned by Problem.to_dict
+            - an object with such a "problem", and optionally "objective", "max_time_in_seconds" and "name"
+        A JSON document can also be a list of items.
+
+        Returns a list of keyword arguments of submit().
+        """
+        text = body.decode("utf-8")
+        try:
+            items = json.loads(text)
+            items = items if isinstance(items, list) else [items]
+        except json.JSONDecodeError:
+            items = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+        submissions = []
+        for item in items:
+            if "problem" not in item:
+                item = {"problem": item}
+            submissions.append({
+                "problem": Problem.from_dict(item["problem"]),
+                "objective": item.get("objective"),
+                "max_time_in_seconds": item.get("max_time_in_seconds"),
+                "name": item.get("name"),
+            })
+        return submissions
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves one HTTP request per connection, see the module documentation"""
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1")
+                if line.strip() == "":
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            await self._route(method, urlsplit(target).path.strip("/").split("/"), body, writer)
+        except (ValueError, KeyError, TypeError) as e:
+            _respond(writer, 400, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method: str, path: list[str], body: bytes, writer: asyncio.StreamWriter):
+        if path[0] != "jobs" or len(path) > 3 or (len(path) == 3 and path[2] != "events"):
+            return _respond(writer, 404, {"error": "not found"})
+
+        if len(path) == 1:
+            if method == "POST":
+                jobs = [self.submit(**submission) for submission in self.parse(body)]
+            elif method == "GET":
+                jobs = list(self.jobs.values())
+            else:
+                return _respond(writer, 405, {"error": f"{method} not allowed"})
+            return _respond(writer, 200, {"jobs": [job.to_dict() for job in jobs]})
+
+        job = self.jobs.get(path[1])
+        if job is None:
+            return _respond(writer, 404, {"error": f"unknown job {path[1]}"})
+        if method == "DELETE" and len(path) == 2:
+            return _respond(writer, 200, self.cancel(job.id).to_dict())
+        if method != "GET":
+            return _respond(writer, 405, {"error": f"{method} not allowed"})
+        if len(path) == 2:
+            return _respond(writer, 200, job.to_dict())
+
+        # events are streamed without a length, the end of the stream is marked by closing the connection
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            changed = job.changed
+            for event in job.events[sent:]:
+                writer.write(json.dumps(event).encode("utf-8") + b"\n")
+            sent = len(job.events)
+            await writer.drain()
+            if job.status in FINISHED:
+                return
+            await changed.wait()
+
+
+def _respond(writer: asyncio.StreamWriter, status: int, content: dict):
+    body = json.dumps(content).encode("utf-8")
+    writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+
+
+async def serve(service: SolveService, host: str = "127.0.0.1", port: int = 8765, unix: str = None):
+    """Serves requests to service until cancelled, on a Unix socket at path unix if not None, on host and port otherwise"""
+    await service.start()
+    if unix is not None:
+        server = await asyncio.start_unix_server(service.handle, unix)
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--unix", help="path of a Unix socket to listen on, instead of host and port")
+    parser.add_argument("--workers", type=int, default=1, help="count of problems solved at the same time")
+    parser.add_argument("--max-time", type=float, default=6000, help="default time limit per problem, in seconds")
+    parser.add_argument("--cache", help="directory of the solution cache, none if not specified")
+    parser.add_argument("--templates", help="directory of the model template cache, in memory only if not specified")
+    args = parser.parse_args()
+
+    config = SolverConfig(max_time_in_seconds=args.max_time, num_workers=max(1, (os.cpu_count() or 1) // args.workers))
+    service = SolveService(args.workers, config, ModelTemplateCache(directory=args.templates), SolutionCache(args.cache) if args.cache else None)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
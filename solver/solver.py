@@ -1,4 +1,17 @@
+import collections
+import functools
+import json
 import math
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from google.protobuf import text_format
+from ortools.sat import cp_model_pb2
 from ortools.sat.python import cp_model
 
 
@@ -15,43 +28,178 @@ def compute_valid_angles(A: int) -> list[int]:
     return sorted(rounded)
 
 
+def compute_valid_deltas(A: int, S: int = None) -> list[int]:
+    """
+    Computes the set of angle deltas between filters stacked on top of each other, which energies depend on.
+
+    S, if not None, is the count of slices of pizzas, rotating a pizza by one slice adds floor(360 / S) degrees to the
+    angles of all its filters. Deltas then include the differences of rotations, which may not be valid angles themselves.
+    """
+    valid_angles = compute_valid_angles(A)
+    offset = math.floor(360.0 / S) if S else 0
+    # offsets of two pizzas are in range 0..S-1, their difference in -(S-1)..S-1
+    rotations = range(-(S - 1), S) if S else [0]
+    return sorted(set((a - b + offset * t) % 180 for a in valid_angles for b in valid_angles for t in rotations))
+
+
+def compute_transmittance(Δ: int) -> float:
+    """
+    Computes the fraction of energy flowing through two linear polarized filters rotated by Δ degrees, cos²(Δ).
+
+    The fraction is rounded to 9 decimals, so that deltas with the same physical effect, such as Δ and 180 - Δ, get
+    exactly the same fraction rather than ones differing by floating point noise.
+    """
+    return round(math.pow(math.cos(Δ * math.pi / 180.0), 2), 9)
+
+
 def compute_energy(previous_energy: int, Δ: int) -> int:
     """Computes energy flowing through two linear polarized filters rotated by Δ degrees with respect to one another"""
-    return round(previous_energy * math.pow(math.cos(Δ * math.pi / 180.0), 2))
+    # round half up, so that eg. half of 25 is 13 regardless of Δ
+    return math.floor(previous_energy * compute_transmittance(Δ) + 0.5)
 
 
-def compute_transitions(A: int, P: int) -> list[(int, int, int)]:
+def compute_energy_levels(A: int, P: int, S: int = None) -> list[list[int]]:
+    """
+    Returns the exact energies reachable after each filter, starting from energy 100.
+        - levels[i] is the sorted list of energies flowing out of pizza i, rounded after every pizza by compute_energy
+    S, if not None, accounts for rotations of pizzas, see compute_valid_deltas
+    """
+    return [list(level) for level in _compute_energy_levels(A, P, S)]
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_energy_levels(A: int, P: int, S: int = None) -> tuple:
+    levels = [(100,)]
+    for _ in range(1, P):
+        levels.append(tuple(sorted(set(compute_energy(e, Δ) for e in levels[-1] for Δ in compute_valid_deltas(A, S)))))
+    return tuple(levels)
+
+
+def compute_transitions(A: int, P: int, S: int = None) -> list[(int, int, int)]:
     """
     Returns a list of triplets (previous_energy, Δ, next_energy) representing the change in energy flowing through pairs of
     filters rotated by Δ degrees.
-    The list constitutes a graph of all paths starting from energy 100 up to P filters.
+    The list constitutes a graph of all paths starting from energy 100 up to P filters, energies being states.
+    S, if not None, accounts for rotations of pizzas, see compute_valid_deltas
     """
-    transitions = set([])
+    return list(_compute_transitions(A, P, S))
 
-    previous_energies = set([100])
-    next_energies = set([])
-    for _ in range(1, P):
-        for previous_energy in previous_energies.copy():
-            for Δ in compute_valid_angles(A):
-                new_energy = compute_energy(previous_energy, Δ)
 
-                # HACK: avoid duplicate states because off-by-one roundings
-                if new_energy + 1 in next_energies:
-                    new_energy = new_energy + 1
-                if new_energy - 1 in next_energies:
-                    new_energy = new_energy - 1
+@functools.lru_cache(maxsize=None)
+def _compute_transitions(A: int, P: int, S: int = None) -> tuple:
+    transitions = set()
+    for level in _compute_energy_levels(A, P, S)[:-1]:
+        for previous_energy in level:
+            for Δ in compute_valid_deltas(A, S):
+                transitions.add((previous_energy, Δ, compute_energy(previous_energy, Δ)))
+    return tuple(sorted(transitions, reverse=True))
+
+
+def compute_automaton(A: int, P: int, targets, S: int = None) -> (int, list[int], list[(int, int, int)]):
+    """
+    Returns the minimal automaton reading the P - 1 deltas of a stack of P pizzas and accepting those ending with an
+    energy in targets.
+
+    States are layered by pizza, and states of a layer with the same accepted suffixes are merged, so the automaton does
+    not depend on how many distinct energies lead to the same outcome. States are numbered canonically.
+
+    S, if not None, accounts for rotations of pizzas, see compute_valid_deltas
+
+    Returns a triplet (start_state, final_states, transitions), or None if no energy in targets is reachable.
+    """
+    return _compute_automaton(A, P, frozenset(targets), S)
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_automaton(A: int, P: int, targets: frozenset, S: int = None) -> (int, list[int], list[(int, int, int)]):
+    valid_deltas = compute_valid_deltas(A, S)
+    levels = _compute_energy_levels(A, P, S)
+
+    # classes[i][e] is the equivalence class of energy e out of pizza i, or absent if no target can be reached from it
+    classes = [{} for _ in levels]
+    signatures = [[] for _ in levels]
+    classes[-1] = {e: 0 for e in levels[-1] if e in targets}
+    signatures[-1] = [()]
+    for i in reversed(range(len(levels) - 1)):
+        layer_signatures = {}
+        for e in levels[i]:
+            signature = tuple((Δ, classes[i + 1][compute_energy(e, Δ)]) for Δ in valid_deltas if compute_energy(e, Δ) in classes[i + 1])
+            if signature:
+                layer_signatures[e] = signature
+        signatures[i] = sorted(set(layer_signatures.values()))
+        index = {signature: c for c, signature in enumerate(signatures[i])}
+        classes[i] = {e: index[signature] for e, signature in layer_signatures.items()}
+
+    if 100 not in classes[0] or not classes[-1]:
+        return None
+
+    # states are numbered layer by layer
+    first_state = [0]
+    for layer_signatures in signatures:
+        first_state.append(first_state[-1] + len(layer_signatures))
+
+    transitions = []
+    for i in range(len(levels) - 1):
+        for c, signature in enumerate(signatures[i]):
+            for Δ, next_c in signature:
+                transitions.append((first_state[i] + c, Δ, first_state[i + 1] + next_c))
+
+    return first_state[0] + classes[0][100], [first_state[-2]], transitions
 
-                transitions.add((previous_energy, Δ, new_energy))
-                next_energies.add(new_energy)
-        previous_energies = next_energies
 
-    return sorted(transitions, reverse=True)
+def rotations_preserve_angles(S: int, A: int) -> bool:
+    """
+    Returns True if rotating a pizza by any number of slices maps valid angles onto valid angles.
+    If so, rotating a pizza can be compensated by changing its offsets in all images.
+    """
+    valid_angles = compute_valid_angles(A)
+    offset = math.floor(360.0 / S)
+    return (offset * S) % 180 == 0 and all((a + offset) % 180 in valid_angles for a in valid_angles)
+
+
+def angles_form_group(A: int) -> bool:
+    """
+    Returns True if the sum of any two valid angles is a valid angle (modulo 180).
+    If so, the same angle can be added to all filters without changing any delta.
+    """
+    valid_angles = compute_valid_angles(A)
+    return all((a + b) % 180 in valid_angles for a in valid_angles for b in valid_angles)
+
+
+def correct(α, n) -> (np.ndarray, np.ndarray):
+    """
+    Computes the slices and angles of filters once pizzas are rotated.
+
+        α is an array of angles, shaped (..., P, S, W)
+            - α[..., i, j, k] is the angle of the filter at window k on slice j on pizza i
+        n is an array of offsets, shaped (..., M, P)
+            - n[..., m, i] is the slice offset of pizza i to get the image m
+        leading dimensions, if any, are broadcast against each other
+
+    Returns:
+        j_corrected, shaped (..., M, P, S)
+            - j_corrected[..., m, i, j] is the index of the slice of pizza i under slice j in image m
+        α_corrected, shaped (..., M, P, S, W)
+            - α_corrected[..., m, i, j, k] is the angle of the filter at window k of pizza i and slice j in image m
+    """
+    α = np.asarray(α)
+    n = np.asarray(n)
+    P, S, W = α.shape[-3:]
+    M = n.shape[-2]
+    batch = np.broadcast_shapes(α.shape[:-3], n.shape[:-2])
+    α = np.broadcast_to(α, batch + (P, S, W))
+    n = np.broadcast_to(n, batch + (M, P))
+
+    j_corrected = (np.arange(S) - n[..., None]) % S
+    α_rotated = np.take_along_axis(α[..., None, :, :, :], j_corrected[..., None], axis=-2)
+    α_corrected = (α_rotated + math.floor(360.0 / S) * n[..., None, None]) % 180
+    return j_corrected, α_corrected
 
 
 class Problem:
     """Represents all inputs to an Opticon problem (finding combinations of angles and rotations for an Opticon)."""
 
-    def __init__(self, P: int, S: int, W: int, A: int, p: list[list[list[int]]]):
+    def __init__(self, P: int, S: int, W: int, A: int, p: list[list[list[int]]], tolerance: int = 0):
         """
             P is the count of identical and regular polygons in the stack ("pizzas")
                 - pizza 0 is at the bottom of the stack, P at the top
@@ -59,65 +207,337 @@ class Problem:
                 - 0 being the top-most, proceeding clockwise
             W is the count of windows per slice
                 - 0 being the top left, proceeding by columns then rows
+                - rows are rings of windows, from the outermost, see printer.compute_window_centers
             A is the number of distinct angle offsets of filters in windows
             p is the list of pixels of images
                 - p[m][j][k] is image m's pixel value at slice j and window k
                 - values are in range 0-100 (rounded percent)
+            tolerance is the largest acceptable difference between pixel values and energies
         """
         self.P = P
         self.S = S
         self.W = W
         self.A = A
         self.p = p
+        self.tolerance = tolerance
 
     def __str__(self) -> str:
         return f"{self.P} pizzas, {self.S} slices, {self.W} windows per slice, {self.A} possible angles, {len(self.p)} images"
 
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable representation of this problem"""
+        return {"P": self.P, "S": self.S, "W": self.W, "A": self.A, "p": self.p, "tolerance": self.tolerance}
+
+    @staticmethod
+    def from_dict(d: dict) -> "Problem":
+        """Returns the problem represented by a dict returned by to_dict"""
+        return Problem(d["P"], d["S"], d["W"], d["A"], d["p"], d.get("tolerance", 0))
+
+
+class Telemetry:
+    """Represents metrics collected while building and solving the model of an Opticon problem."""
+
+    def __init__(self, build_times: dict = None, variables: int = 0, constraints: int = 0, conflicts: int = 0, branches: int = 0, bound: float = None, log: list[str] = None):
+        """
+            build_times maps stages of building the model to the seconds they took, see build_template and build_model
+                - stages of the template are reported as measured when the template was built, even if it was cached
+            variables and constraints are the counts in the model, before CP-SAT presolve
+            conflicts and branches are the counts reached by CP-SAT during the search
+            bound is the best bound on the objective proven by CP-SAT, for models with an objective
+            log is the list of lines of the CP-SAT log, if it was enabled, see SolverConfig
+        """
+        self.build_times = build_times or {}
+        self.variables = variables
+        self.constraints = constraints
+        self.conflicts = conflicts
+        self.branches = branches
+        self.bound = bound
+        self.log = log or []
+        self.presolve_time, self.progress = _parse_log(self.log)
+
+    @property
+    def build_time(self) -> float:
+        """Returns the total time spent building the model"""
+        return sum(self.build_times.values())
+
+    @property
+    def first_solution_time(self) -> float:
+        """Returns the time the first solution was found at, relative to the start of the search, or None"""
+        return next((t for t, event, _, _ in self.progress if event.isdigit()), None)
+
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable representation of these metrics, without the log"""
+        return {
+            "build_times": self.build_times,
+            "variables": self.variables,
+            "constraints": self.constraints,
+            "presolve_time": self.presolve_time,
+            "first_solution_time": self.first_solution_time,
+            "conflicts": self.conflicts,
+            "branches": self.branches,
+            "bound": self.bound,
+            "progress": self.progress,
+        }
+
+
+# progress lines of the CP-SAT log, eg. "#3  0.05s best:3  next:[0,2]  default_lp"
+_PROGRESS_LINE = re.compile(r"#(\w+)\s+([\d.]+)s(?:\s+best:(\S+))?(?:\s+next:\[(-?\d+)?)?")
+# first and last line of CP-SAT presolve
+_PRESOLVE_START = re.compile(r"Starting presolve at ([\d.]+)s")
+_PRESOLVE_END = re.compile(r"Starting (?:search|to load the model) at ([\d.]+)s")
+
+
+def _parse_log(log: list[str]) -> (float, list[(float, str, float, float)]):
+    """
+    Parses the lines of a CP-SAT log.
+
+    Returns a pair (presolve_time, progress):
+        - presolve_time is the time spent in CP-SAT presolve, or None if the log does not mention it
+        - progress is a list of (time, event, best, bound) quadruplets, one per progress line of the log
+            - event is the solution number, or a name such as "Bound" or "Done"
+            - best is the objective of the best solution, bound the proven bound on it, if mentioned
+    """
+    presolve_start = presolve_end = None
+    progress = []
+    for line in log:
+        match = _PROGRESS_LINE.match(line)
+        if match:
+            event, t, best, bound = match.groups()
+            progress.append((
+                float(t),
+                event,
+                float(best) if best not in (None, "inf", "-inf") else None,
+                float(bound) if bound is not None else None,
+            ))
+            continue
+        match = _PRESOLVE_START.match(line)
+        if match and presolve_start is None:
+            presolve_start = float(match.group(1))
+            continue
+        match = _PRESOLVE_END.match(line)
+        if match and presolve_start is not None and presolve_end is None:
+            presolve_end = float(match.group(1))
+
+    presolve_time = presolve_end - presolve_start if presolve_end is not None else None
+    return presolve_time, progress
+
 
 class Solution:
     """Represents outputs of an Opticon problem."""
 
-    def __init__(self, success: bool, wall_time: float, α: list[list[list[int]]], n: list[list[int]], j_corrected: list[list[list[int]]], α_corrected: list[list[list[list[int]]]]):
+    __slots__ = ("success", "wall_time", "α", "n", "objective", "telemetry", "_j_corrected", "_α_corrected")
+
+    def __init__(self, success: bool, wall_time: float, α, n, objective: int = None, telemetry: Telemetry = None):
         """
-            α the list of angles for each filter on each window
+            α the array of angles for each filter on each window, shaped (P, S, W)
                 - α[i][j][k] is the angle of the filter at window k on slice j on pizza i
-            n is the list of offsets, measured in slices, of each pizza in the stack to obtain a certain image
+            n is the array of offsets, measured in slices, of each pizza in the stack to obtain a certain image, shaped (M, P)
                 - n[m][i] is the slice offset of pizza i to get the image m (measured clock-wise)
+            objective is how far α and n are from reproducing all pixels, for solutions of solve_soft
+            telemetry is the Telemetry of the solve that found this solution, if any
 
-            Other parameters are internal and added for testing/debugging purposes only
+            α and n can also be nested lists, they are stored as compact integer arrays. Both are empty for solutions
+            that were not found.
         """
         self.success = success
         self.wall_time = wall_time
+        self.α = np.asarray(α, dtype=np.int32)
+        self.n = np.asarray(n, dtype=np.int32)
+        self.objective = objective
+        self.telemetry = telemetry
+        self._j_corrected = None
+        self._α_corrected = None
+
+    @property
+    def j_corrected(self) -> np.ndarray:
+        """
+        Returns the slices of filters once pizzas are rotated, computed on first access for testing/debugging purposes.
+            - j_corrected[j][m][i] is the index of the slice of pizza i under slice j in image m
+        """
+        if self._j_corrected is None:
+            self._correct()
+        return self._j_corrected
+
+    @property
+    def α_corrected(self) -> np.ndarray:
+        """
+        Returns the angles of filters once pizzas are rotated, computed on first access for testing/debugging purposes.
+            - α_corrected[m][i][j][k] is the angle of the filter at window k of pizza i and slice j in image m
+        """
+        if self._α_corrected is None:
+            self._correct()
+        return self._α_corrected
+
+    def _correct(self):
+        if self.n.size == 0:
+            self._j_corrected = self._α_corrected = np.zeros(0, dtype=np.int32)
+            return
+        j_corrected, self._α_corrected = correct(self.α, self.n)
+        self._j_corrected = j_corrected.transpose(2, 0, 1)
+
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable representation of this solution"""
+        return {"success": self.success, "wall_time": self.wall_time, "α": self.α.tolist(), "n": self.n.tolist(), "objective": self.objective}
+
+    @staticmethod
+    def from_dict(d: dict) -> "Solution":
+        """Returns the solution represented by a dict returned by to_dict"""
+        return Solution(d["success"], d["wall_time"], d["α"], d["n"], d["objective"])
+
+
+CLASSIC = "classic"
+LEAN = "lean"
+FORMULATIONS = [CLASSIC, LEAN]
+
+MISMATCHES = "mismatches"
+ERROR = "error"
+OBJECTIVES = [MISMATCHES, ERROR]
+
+# in soft models, automata read the end energy e as label _SOFT_LABEL + e, then move to state _SOFT_END
+_SOFT_LABEL = 1000
+_SOFT_END = -1
+
+
+class SolverConfig:
+    """Represents the CP-SAT parameters used to solve Opticon models."""
+
+    # named sets of parameters, see preset()
+    PRESETS = {
+        # quick, light-weight search for a first solution
+        "fast-feasible": {"linearization_level": 0, "cp_model_probing_level": 1},
+        # heavier reasoning, to prove that no solution exists
+        "prove-infeasible": {"linearization_level": 2, "symmetry_level": 4},
+    }
+
+    def __init__(self, max_time_in_seconds: float = 6000, num_workers: int = 0, random_seed: int = None, deterministic: bool = False, log_search_progress: bool = True, log_to_stdout: bool = False, parameters: dict = None):
+        """
+            max_time_in_seconds is the time limit for each solve
+                - measured in deterministic time rather than wall time if deterministic
+            num_workers is the number of CP-SAT search workers, 0 for one per core
+            random_seed is the seed of CP-SAT, if not None
+            deterministic makes results reproducible across runs
+                - workers then take turns rather than racing, trading speed for reproducibility
+            log_search_progress captures the CP-SAT log into the Telemetry of solutions
+            log_to_stdout also prints the CP-SAT log
+            parameters is a dict of any other CP-SAT SatParameters, by field name
+        """
+        self.max_time_in_seconds = max_time_in_seconds
+        self.num_workers = num_workers
+        self.random_seed = random_seed
+        self.deterministic = deterministic
+        self.log_search_progress = log_search_progress
+        self.log_to_stdout = log_to_stdout
+        self.parameters = parameters or {}
+
+    @staticmethod
+    def preset(name: str, **kwargs) -> "SolverConfig":
+        """Returns a configuration with the parameters of the named preset in PRESETS, other arguments as in __init__"""
+        if name not in SolverConfig.PRESETS:
+            raise ValueError(f"unknown preset {name}, expected one of {list(SolverConfig.PRESETS)}")
+        parameters = dict(SolverConfig.PRESETS[name])
+        parameters.update(kwargs.pop("parameters", {}))
+        return SolverConfig(parameters=parameters, **kwargs)
+
+    def replace(self, **kwargs) -> "SolverConfig":
+        """Returns a copy of this configuration with some arguments, as in __init__, changed"""
+        arguments = dict(vars(self))
+        arguments.update(kwargs)
+        return SolverConfig(**arguments)
+
+    def apply(self, solver: cp_model.CpSolver):
+        """Sets parameters of solver according to this configuration"""
+        solver.parameters.log_search_progress = self.log_search_progress
+        solver.parameters.log_to_stdout = self.log_to_stdout
+        solver.parameters.num_workers = self.num_workers
+        if self.random_seed is not None:
+            solver.parameters.random_seed = self.random_seed
+        if self.deterministic:
+            solver.parameters.interleave_search = True
+            solver.parameters.interleave_batch_size = 1
+            solver.parameters.max_deterministic_time = self.max_time_in_seconds
+        else:
+            solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        for name, value in self.parameters.items():
+            setattr(solver.parameters, name, value)
+
+
+class Cancellation:
+    """Represents a request to stop searches, which can be made from any thread."""
+
+    def __init__(self, event=None):
+        """
+            event is the Event recording the request (defaults to a threading.Event)
+                - an Event of a multiprocessing Manager allows cancelling searches in other processes
+        """
+        self.event = event or threading.Event()
+
+    def cancel(self):
+        """Stops searches using this cancellation as soon as possible, they return the best Solution found so far"""
+        self.event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def watch(self, solver: cp_model.CpSolver) -> threading.Event:
+        """
+        Stops the search of solver once cancelled, until the returned event is set.
+
+        Cancellation is checked periodically, so it is not lost if it happens right before the search starts.
+        """
+        done = threading.Event()
+
+        def run():
+            while not done.wait(0.05):
+                if self.event.is_set():
+                    solver.StopSearch()
+
+        threading.Thread(target=run, daemon=True).start()
+        return done
+
+
+class Model:
+    """Represents a CP-SAT model of an Opticon problem, along with its variables."""
+
+    def __init__(self, model: cp_model.CpModel, α: list, n: list, j_corrected: list, α_corrected: list, D: list, build_times: dict = None):
+        """
+            model is the CP-SAT model
+            α, n are the output variables, indexed as in Solution
+            j_corrected, α_corrected, D are the intermediate variables, indexed as in build_model
+                - j_corrected is None if the formulation does not need it
+            build_times maps stages of building the model to the seconds they took, see Telemetry
+        """
+        self.model = model
         self.α = α
         self.n = n
         self.j_corrected = j_corrected
         self.α_corrected = α_corrected
+        self.D = D
+        self.build_times = build_times or {}
 
 
-def solve(problem: Problem) -> Solution:
+def build_model(problem: Problem, formulation: str = CLASSIC, symmetry_breaking: bool = False, templates: "ModelTemplateCache" = None, objective: str = None) -> Model:
     """
-    Finds combinations of angles and rotations for an Opticon.
+    Builds a CP-SAT model for an Opticon problem.
 
-        P is the count of identical and regular polygons in the stack ("pizzas")
-            - pizza 0 is at the bottom of the stack, P at the top
-        S is the count of triangles in pizzas ("slices")
-            - 0 being the top-most, proceeding clockwise
-        W is the count of windows per slice
-            - 0 being the top left, proceeding by columns then rows
-        A is the number of distinct angle offsets of filters in windows
-        p is the list of pixels of images
-            - p[m][j][k] is image m's pixel value at slice j and window k
-            - values are in range 0-100 (rounded percent)
-
-    Returns:
-        α the list of angles for each filter on each window
-            - α[i][j][k] is the angle of the filter at window k on slice j on pizza i
-        n is the list of offsets, measured in slices, of each pizza in the stack to obtain a certain image
-            - n[m][i] is the slice offset of pizza i to get the image m (measured clock-wise)
-            - note that it's not defined for pizza 0 (there's nothing below)
+    formulation is one of:
+        - CLASSIC: rotations are expressed by chains of intermediate variables and modulo equalities
+        - LEAN: rotations and deltas are expressed by precomputed tables, with far fewer variables and constraints
+    symmetry_breaking adds constraints excluding solutions equivalent to others, see _break_geometric_symmetries
+        and _break_image_symmetries
+    templates is the cache of structural parts of models to use (defaults to TEMPLATES)
+        - only constraints depending on pixel values are added on top of a cached template
+    objective makes pixel constraints soft, and is one of:
+        - None: all pixels must be reproduced exactly
+        - MISMATCHES: the count of pixels not reproduced exactly is minimized
+        - ERROR: the sum of absolute differences between reproduced and expected pixels is minimized
     """
-    # Model
-    model = cp_model.CpModel()
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"unknown formulation {formulation}, expected one of {FORMULATIONS}")
+    if objective is not None and objective not in OBJECTIVES:
+        raise ValueError(f"unknown objective {objective}, expected one of {OBJECTIVES}")
+    if templates is None:
+        templates = TEMPLATES
 
     # Input Variables
     P = problem.P
@@ -125,6 +545,116 @@ def solve(problem: Problem) -> Solution:
     W = problem.W
     A = problem.A
     p = problem.p
+    M = len(p)
+
+    # Model
+    template = templates.get(P, S, W, A, M, formulation, symmetry_breaking)
+    start = time.perf_counter()
+    built = template.instantiate()
+    model = built.model
+    D = built.D
+    built.build_times["instantiate"] = time.perf_counter() - start
+
+    # Constraints
+    start = time.perf_counter()
+    if objective is None:
+        tolerance = problem.tolerance
+        for m in range(M):
+            for j in range(S):
+                for k in range(W):
+                    automaton = compute_automaton(A, P, range(p[m][j][k] - tolerance, p[m][j][k] + tolerance + 1), S)
+                    if automaton is None:
+                        # unreachable pixel
+                        model.AddBoolOr([])
+                        continue
+                    start_state, final_states, transitions = automaton
+                    model.AddAutomaton(D[j][k][m][1:], start_state, final_states, transitions)
+    else:
+        _add_soft_constraints(model, problem, D, objective)
+    built.build_times["automata"] = time.perf_counter() - start
+
+    if symmetry_breaking:
+        start = time.perf_counter()
+        _break_image_symmetries(model, problem, built.n)
+        # templates cached on disk may not record stages
+        built.build_times["symmetries"] = built.build_times.get("symmetries", 0.0) + time.perf_counter() - start
+
+    return built
+
+
+def _add_soft_constraints(model: cp_model.CpModel, problem: Problem, D: list, objective: str):
+    """
+    Adds automata reaching any end energy to model, minimizing the distance between end energies and pixels, beyond the
+    tolerance of problem.
+    """
+    S = problem.S
+    W = problem.W
+    p = problem.p
+    tolerance = problem.tolerance
+
+    terms = []
+    for m in range(len(p)):
+        for j in range(S):
+            for k in range(W):
+                energy = add_soft_automaton(model, D[j][k][m][1:], problem.A, problem.P, S, f"E[{m}][{j}][{k}]")
+
+                distance = model.NewIntVar(0, 100, f"distance[{m}][{j}][{k}]")
+                model.AddAbsEquality(distance, energy - p[m][j][k])
+                if objective == MISMATCHES:
+                    mismatch = model.NewBoolVar(f"mismatch[{m}][{j}][{k}]")
+                    model.Add(distance <= tolerance).OnlyEnforceIf(mismatch.Not())
+                    model.Add(distance > tolerance).OnlyEnforceIf(mismatch)
+                    terms.append(mismatch)
+                else:
+                    error = model.NewIntVar(0, 100, f"error[{m}][{j}][{k}]")
+                    model.AddMaxEquality(error, [distance - tolerance, 0])
+                    terms.append(error)
+    model.Minimize(sum(terms))
+
+
+def add_soft_automaton(model: cp_model.CpModel, D_jkm: list, A: int, P: int, S: int, name: str, targets=None, enforcement=None) -> cp_model.LinearExpr:
+    """
+    Adds an automaton to model reading the deltas of one pixel, D[j][k][m][1:] as in build_model, then the energy E
+    they end with, which can be any energy reachable by P pizzas.
+
+    E is read as the label _SOFT_LABEL + E, so it cannot be confused with deltas. name is the name of its variable.
+    Automata cannot be enforced conditionally, so E is constrained separately:
+        - targets, if not None, are the energies E is restricted to, as in compute_automaton
+        - enforcement, if not None, is the literal the restriction to targets is enforced by
+
+    Returns the expression of E.
+    """
+    end_energies, transitions = _compute_soft_transitions(A, P, S)
+    E = model.NewIntVarFromDomain(cp_model.Domain.FromValues([_SOFT_LABEL + e for e in end_energies]), name)
+    model.AddAutomaton(D_jkm + [E], 100, [_SOFT_END], transitions)
+
+    energy = E - _SOFT_LABEL
+    if targets is not None:
+        constraint = model.AddLinearExpressionInDomain(energy, cp_model.Domain.FromValues(list(targets)))
+        if enforcement is not None:
+            constraint.OnlyEnforceIf(enforcement)
+    return energy
+
+
+@functools.lru_cache(maxsize=None)
+def _compute_soft_transitions(A: int, P: int, S: int = None) -> (list[int], list[(int, int, int)]):
+    """Returns the end energies of P pizzas and the transitions of automata reading them, see add_soft_automaton"""
+    end_energies = compute_energy_levels(A, P, S)[-1]
+    return end_energies, compute_transitions(A, P, S) + [(e, _SOFT_LABEL + e, _SOFT_END) for e in end_energies]
+
+
+def build_template(P: int, S: int, W: int, A: int, M: int, formulation: str, symmetry_breaking: bool) -> "ModelTemplate":
+    """
+    Builds the part of a model that does not depend on pixel values, see build_model.
+
+    The time taken by each stage is recorded in the build_times of the template: α, n, j_corrected (CLASSIC only),
+    α_corrected (including α_shifted for LEAN), D and symmetries.
+    """
+    times = {}
+    start = time.perf_counter()
+
+    # Model
+    model = cp_model.CpModel()
 
     # Output Variables
     α_domain = cp_model.Domain.FromValues(compute_valid_angles(A))
@@ -140,9 +670,9 @@ def solve(problem: Problem) -> Solution:
                 α_ij.append(α_ijk)
             α_i.append(α_ij)
         α.append(α_i)
+    start = _lap(times, "α", start)
 
     # n[m][i] is the slice offset of pizza i to get the image m
-    M = len(p)
     n = []
     for m in range(M):
         n_m = [0]
@@ -150,8 +680,175 @@ def solve(problem: Problem) -> Solution:
             n_mi = model.NewIntVar(0, S - 1, f"n[{m}][{i}]")
             n_m.append(n_mi)
         n.append(n_m)
+    _lap(times, "n", start)
 
     # Intermediate Variables
+    if formulation == CLASSIC:
+        j_corrected, α_corrected, D = _build_classic(model, P, S, W, A, M, α, n, times)
+    else:
+        j_corrected, α_corrected, D = _build_lean(model, P, S, W, A, M, α, n, times)
+
+    start = time.perf_counter()
+    if symmetry_breaking:
+        _break_geometric_symmetries(model, P, S, A, α, n)
+    _lap(times, "symmetries", start)
+
+    return ModelTemplate(model, {
+        "α": _indices(α),
+        "n": [_indices(n_m[1:]) for n_m in n],
+        "j_corrected": _indices(j_corrected),
+        "α_corrected": _indices(α_corrected),
+        "D": _indices(D),
+    }, times)
+
+
+def _lap(times: dict, stage: str, start: float) -> float:
+    """Records the time elapsed since start as the time taken by stage in times, returns the current time"""
+    now = time.perf_counter()
+    times[stage] = now - start
+    return now
+
+
+def _indices(variables):
+    """Maps nested lists of variables to nested lists of their indices in the model"""
+    if variables is None:
+        return None
+    if isinstance(variables, list):
+        return [_indices(v) for v in variables]
+    return variables.Index()
+
+
+def _variables(model: cp_model.CpModel, indices):
+    """Maps nested lists of indices to nested lists of variables in model, see _indices"""
+    if indices is None:
+        return None
+    if isinstance(indices, list):
+        return [_variables(model, i) for i in indices]
+    return model.GetIntVarFromProtoIndex(indices)
+
+
+class ModelTemplate:
+    """Represents the part of a model that does not depend on pixel values, shared by problems with the same geometry."""
+
+    def __init__(self, model: cp_model.CpModel, layout: dict, build_times: dict = None):
+        """
+            model is the model, without automata constraints
+            layout maps the names of variables in Model to nested lists of their indices in model
+                - n omits pizza 0, which is never rotated
+            build_times maps stages of build_template to the seconds they took
+        """
+        self.model = model
+        self.layout = layout
+        self.build_times = build_times or {}
+
+    def instantiate(self) -> Model:
+        """Returns a new model copied from this template"""
+        model = _clone(self.model)
+
+        layout = self.layout
+        return Model(
+            model,
+            _variables(model, layout["α"]),
+            [[0] + _variables(model, n_m) for n_m in layout["n"]],
+            _variables(model, layout["j_corrected"]),
+            _variables(model, layout["α_corrected"]),
+            _variables(model, layout["D"]),
+            dict(self.build_times),
+        )
+
+
+def _clone(model: cp_model.CpModel) -> cp_model.CpModel:
+    """Returns a copy of model, CpModel.Clone replaced CpModel.CopyFrom in recent OR-Tools versions"""
+    if hasattr(model, "Clone"):
+        return model.Clone()
+    clone = cp_model.CpModel()
+    clone.CopyFrom(model)
+    return clone
+
+
+def _to_text(model: cp_model.CpModel) -> str:
+    """Returns the CpModelProto of model in text format, which all OR-Tools versions can write and parse"""
+    return str(model.Proto())
+
+
+def _from_text(text: str) -> cp_model.CpModel:
+    """Returns the model whose CpModelProto is text, see _to_text"""
+    model = cp_model.CpModel()
+    proto = model.Proto()
+    if hasattr(proto, "parse_text_format"):
+        # recent OR-Tools versions wrap the C++ proto, which has no Python protobuf API
+        proto.parse_text_format(text)
+    else:
+        text_format.Parse(text, proto)
+    return model
+
+
+class ModelTemplateCache:
+    """Keeps the most recently used model templates in memory and, optionally, on disk."""
+
+    def __init__(self, maxsize: int = 16, directory: str = None):
+        """
+            maxsize is the maximum number of templates kept in memory
+            directory is where templates are serialized to, if not None
+                - each template is stored as a CpModelProto in text format (.txt) and its layout (.json)
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self.templates = collections.OrderedDict()
+        self.builds = 0
+        self.lock = threading.Lock()
+
+    def get(self, P: int, S: int, W: int, A: int, M: int, formulation: str, symmetry_breaking: bool) -> ModelTemplate:
+        """Returns the template for the specified geometry, building it if it was not cached"""
+        key = (P, S, W, A, M, formulation, symmetry_breaking)
+        with self.lock:
+            if key in self.templates:
+                self.templates.move_to_end(key)
+                return self.templates[key]
+
+        template = self._load(key)
+        if template is None:
+            template = build_template(*key)
+            self.builds += 1
+            self._store(key, template)
+
+        with self.lock:
+            self.templates[key] = template
+            while len(self.templates) > self.maxsize:
+                self.templates.popitem(last=False)
+        return template
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.directory, "-".join(str(k) for k in key))
+
+    def _load(self, key: tuple) -> ModelTemplate:
+        if self.directory is None or not os.path.exists(self._path(key) + ".json"):
+            return None
+        with open(self._path(key) + ".txt") as txt_file:
+            model = _from_text(txt_file.read())
+        with open(self._path(key) + ".json") as json_file:
+            layout = json.load(json_file)
+        return ModelTemplate(model, layout, layout.pop("build_times", None))
+
+    def _store(self, key: tuple, template: ModelTemplate):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(key) + ".txt", "w") as txt_file:
+            txt_file.write(_to_text(template.model))
+        # layout is written last, as it marks the template as complete
+        with open(self._path(key) + ".json", "w") as json_file:
+            json.dump(dict(template.layout, build_times=template.build_times), json_file)
+
+
+# default cache used by build_model
+TEMPLATES = ModelTemplateCache()
+
+
+def _build_classic(model: cp_model.CpModel, P: int, S: int, W: int, A: int, M: int, α: list, n: list, times: dict) -> (list, list, list):
+    """Adds intermediate variables to model, computing rotations with element and modulo constraints"""
+    start = time.perf_counter()
+    α_domain = cp_model.Domain.FromValues(compute_valid_angles(A))
 
     # j_corrected[j][m][i] is the index of the slice under slice j
     # corrected by its n[m][i] (how many slices pizza i is rotated)
@@ -167,6 +864,7 @@ def solve(problem: Problem) -> Solution:
                 j_corrected_jm.append(j_corrected_jmi)
             j_corrected_j.append(j_corrected_jm)
         j_corrected.append(j_corrected_j)
+    start = _lap(times, "j_corrected", start)
 
     # α_ikj is α indexed by [i,k,j] instead of [i,j,k]
     α_ikj = []
@@ -202,6 +900,7 @@ def solve(problem: Problem) -> Solution:
                 α_corrected_mi.append(α_corrected_mij)
             α_corrected_m.append(α_corrected_mi)
         α_corrected.append(α_corrected_m)
+    start = _lap(times, "α_corrected", start)
 
     # D[j][k][m][i] is the angle delta between filter in window k on slice j of pizza i
     # and the filter in the same location one pizza below
@@ -224,22 +923,543 @@ def solve(problem: Problem) -> Solution:
                 D_jk.append(D_jkm)
             D_j.append(D_jk)
         D.append(D_j)
+    _lap(times, "D", start)
 
-    # Constraints
-    transitions = compute_transitions(A, P)
+    return j_corrected, α_corrected, D
+
+
+def _build_lean(model: cp_model.CpModel, P: int, S: int, W: int, A: int, M: int, α: list, n: list, times: dict) -> (list, list, list):
+    """Adds intermediate variables to model, computing rotations and deltas with precomputed tables"""
+    start = time.perf_counter()
+    valid_angles = compute_valid_angles(A)
+    offset = math.floor(360.0 / S)
+
+    # α_shifted[i][j][k][t] is the angle of the filter at window k on slice j on pizza i, once pizza i is rotated by
+    # t slices. It does not depend on images, so it is shared by all of them
+    # rotations by the same angle modulo 180 share variables, α itself is used if that angle is 0
+    shifted_angles = sorted(set((a + offset * t) % 180 for a in valid_angles for t in range(S)))
+    shifted_domain = cp_model.Domain.FromValues(shifted_angles)
+    α_shifted = [None]
+    for i in range(1, P):
+        α_shifted_i = []
+        for j in range(S):
+            α_shifted_ij = []
+            for k in range(W):
+                by_shift = {0: α[i][j][k]}
+                for t in range(1, S):
+                    shift = (offset * t) % 180
+                    if shift not in by_shift:
+                        by_shift[shift] = model.NewIntVarFromDomain(shifted_domain, f"α_shifted[{i}][{j}][{k}][{t}]")
+                        model.AddAllowedAssignments([α[i][j][k], by_shift[shift]], [(a, (a + shift) % 180) for a in valid_angles])
+                α_shifted_ij.append([by_shift[(offset * t) % 180] for t in range(S)])
+            α_shifted_i.append(α_shifted_ij)
+        α_shifted.append(α_shifted_i)
+
+    # α_corrected[m][i][j][k] is the angle of the filter at window k of pizza i and slice j
+    # corrected by its n[m][i] (how many slices pizza i is rotated)
+    # pizza 0 is never rotated, so its corrected angles are α itself
+    α_corrected = []
     for m in range(M):
+        α_corrected_m = [α[0]]
+        for i in range(1, P):
+            α_corrected_mi = []
+            for j in range(S):
+                α_corrected_mij = []
+                for k in range(W):
+                    α_corrected_mijk = model.NewIntVarFromDomain(shifted_domain, f"α_corrected[{m}][{i}][{j}][{k}]")
+                    model.AddElement(n[m][i], [α_shifted[i][(j - t) % S][k][t] for t in range(S)], α_corrected_mijk)
+                    α_corrected_mij.append(α_corrected_mijk)
+                α_corrected_mi.append(α_corrected_mij)
+            α_corrected_m.append(α_corrected_mi)
+        α_corrected.append(α_corrected_m)
+    start = _lap(times, "α_corrected", start)
+
+    # D[j][k][m][i] is the angle delta between filter in window k on slice j of pizza i
+    # and the filter in the same location one pizza below, as in _build_classic
+    deltas = [(a_over, a_under, (a_over - a_under) % 180) for a_over in shifted_angles for a_under in shifted_angles]
+    D_domain = cp_model.Domain.FromValues(sorted(set(d for _, _, d in deltas)))
+    D = []
+    for j in range(S):
+        D_j = []
+        for k in range(W):
+            D_jk = []
+            for m in range(M):
+                D_jkm = [None]
+                for i in range(1, P):
+                    D_jkmi = model.NewIntVarFromDomain(D_domain, f"D[{j}][{k}][{m}][{i}]")
+                    model.AddAllowedAssignments([α_corrected[m][i][j][k], α_corrected[m][i - 1][j][k], D_jkmi], deltas)
+                    D_jkm.append(D_jkmi)
+                D_jk.append(D_jkm)
+            D_j.append(D_jk)
+        D.append(D_j)
+    _lap(times, "D", start)
+
+    return None, α_corrected, D
+
+
+def _break_geometric_symmetries(model: cp_model.CpModel, P: int, S: int, A: int, α: list, n: list):
+    """
+    Adds constraints to model that only exclude solutions equivalent to remaining ones:
+        - if angles form a group, adding the same angle to all filters leaves all deltas unchanged,
+          so the filter at window 0 of slice 0 of pizza 0 can be pinned to angle 0
+        - if rotations preserve angles, rotating pizza i can be compensated by changing n[m][i] for all m,
+          so offsets of image 0 can be pinned to 0
+    """
+    if angles_form_group(A):
+        model.Add(α[0][0][0] == 0)
+
+    if rotations_preserve_angles(S, A):
+        for i in range(1, P):
+            model.Add(n[0][i] == 0)
+
+
+def _break_image_symmetries(model: cp_model.CpModel, problem: Problem, n: list):
+    """Adds constraints to model so that identical images are obtained by the same offsets"""
+    p = problem.p
+    for m in range(1, len(p)):
+        first = p.index(p[m])
+        if first < m:
+            for i in range(1, problem.P):
+                model.Add(n[m][i] == n[first][i])
+
+
+def model_size(problem: Problem, formulation: str = CLASSIC, symmetry_breaking: bool = False) -> (int, int):
+    """Returns the count of variables and constraints of the model for problem in the specified formulation"""
+    proto = build_model(problem, formulation, symmetry_breaking).model.Proto()
+    return len(proto.variables), len(proto.constraints)
+
+
+class Reduction:
+    """Represents a problem with duplicate images and windows removed, see find_duplicates."""
+
+    def __init__(self, problem: Problem, reduced: Problem, images: list[(int, int)], windows: list[int]):
+        """
+            problem is the original problem
+            reduced is the problem modeling each class of duplicates once
+            images maps original images to reduced ones
+                - images[m] is (m', r) such that p[m][j] is reduced image m' at slice (j - r) % S
+            windows maps original windows to reduced ones
+                - windows[k] is k' such that p[m][j][k] is reduced window k' for all m and j
+        """
+        self.problem = problem
+        self.reduced = reduced
+        self.images = images
+        self.windows = windows
+
+    def variable_counts(self, formulation: str = CLASSIC) -> (int, int):
+        """Returns the count of variables in the models of the original and of the reduced problem"""
+        return model_size(self.problem, formulation)[0], model_size(self.reduced, formulation)[0]
+
+    def restrict(self, solution: Solution) -> Solution:
+        """
+        Returns the solution to the reduced problem corresponding to a solution of the original problem.
+
+        Offsets are made relative to pizza 0, which models never rotate, as in canonical solutions. Rotating all pizzas
+        by the same offset leaves deltas unchanged, so images where pizza 0 was rotated are only rotated as a whole.
+        """
+        representatives = [self.images.index((m, 0)) for m in range(len(self.reduced.p))]
+        windows = [self.windows.index(k) for k in range(self.reduced.W)]
+        n = solution.n[[m for m in representatives if m < len(solution.n)]]
+        return Solution(
+            solution.success,
+            solution.wall_time,
+            solution.α[:, :, windows],
+            (n - n[:, :1]) % self.problem.S,
+            solution.objective,
+        )
+
+    def expand(self, solution: Solution) -> Solution:
+        """Returns the solution to the original problem corresponding to a solution of the reduced problem"""
+        if not solution.success:
+            return Solution(solution.success, solution.wall_time, [], [], solution.objective, solution.telemetry)
+
+        images, rotations = np.asarray(self.images).T
+        return Solution(
+            solution.success,
+            solution.wall_time,
+            solution.α[:, :, self.windows],
+            (solution.n[images] + rotations[:, None]) % self.problem.S,
+            solution.objective,
+            solution.telemetry,
+        )
+
+
+def find_duplicates(problem: Problem, rotations: bool = False) -> Reduction:
+    """
+    Finds images and windows of problem that can be modeled once.
+
+    Identical images are obtained by the same offsets. Windows having the same pixels in all images can have the same
+    filters.
+
+    If rotations is True, images that are rotations of others by r slices are also considered duplicates: rotating the
+    whole stack, pizza 0 included, by r slices rotates the image. Their offsets for pizza 0 are then r rather than 0.
+    This requires rotating a pizza by S slices not to change its angles, it is ignored otherwise.
+    """
+    S = problem.S
+    p = problem.p
+    rotations = rotations and (S * math.floor(360.0 / S)) % 180 == 0
+
+    reduced_p = []
+    images = []
+    # keys map every rotation of each reduced image to its index and rotation
+    keys = {}
+    for p_m in p:
+        key = tuple(tuple(p_m_j) for p_m_j in p_m)
+        if key not in keys:
+            for r in range(S if rotations else 1):
+                keys.setdefault(tuple(key[(j - r) % S] for j in range(S)), (len(reduced_p), r))
+            reduced_p.append(p_m)
+        images.append(keys[key])
+
+    windows = []
+    columns = {}
+    for k in range(problem.W):
+        column = tuple(p_m[j][k] for p_m in reduced_p for j in range(S))
+        windows.append(columns.setdefault(column, len(columns)))
+    representatives = [windows.index(k) for k in range(len(columns))]
+
+    reduced = Problem(
+        problem.P,
+        S,
+        len(representatives),
+        problem.A,
+        [[[p_m_j[k] for k in representatives] for p_m_j in p_m] for p_m in reduced_p],
+        problem.tolerance,
+    )
+    return Reduction(problem, reduced, images, windows)
+
+
+class FeasibilityReport:
+    """Represents necessary conditions for an Opticon problem to have solutions that were found to be violated."""
+
+    def __init__(self, unreachable: list[(int, int, int)], inconsistent: list[(int, int)]):
+        """
+            unreachable is the list of (m, j, k) pixels whose value no stack of P pizzas can produce
+            inconsistent is the list of (k, i) windows and pizzas whose deltas cannot be the same filters in all images
+                - the sum of deltas between pizza i - 1 and pizza i over all slices, at window k, is the same in all images
+                  (modulo the angle rotations add, see analyze), which pixel values can rule out
+        """
+        self.unreachable = unreachable
+        self.inconsistent = inconsistent
+        self.feasible = not unreachable and not inconsistent
+
+
+def analyze(problem: Problem) -> FeasibilityReport:
+    """
+    Checks necessary conditions for problem to have solutions, without solving it.
+
+    A pixel is unreachable if no energy within tolerance of its value is reachable through P pizzas.
+
+    Rotating pizza i by n slices changes the angles of all its filters by the same amount, so, at window k, the sum over
+    slices of the deltas between pizzas i - 1 and i only depends on offsets through a multiple of S * floor(360 / S).
+    Hence the sum is the same in all images modulo g = gcd(S * floor(360 / S), 180). Every pixel restricts the deltas it
+    may have, and if the sums they allow have no common value across images, the problem is infeasible.
+    """
+    P = problem.P
+    S = problem.S
+    W = problem.W
+    A = problem.A
+    p = problem.p
+    tolerance = problem.tolerance
+    g = math.gcd(S * math.floor(360.0 / S) % 180, 180)
+
+    unreachable = []
+    inconsistent = []
+    for k in range(W):
+        # sums[i][m] is the set of possible sums of deltas between pizzas i and i + 1 at window k in image m
+        sums = [[] for _ in range(P - 1)]
+        for m in range(len(p)):
+            image_sums = [{0} for _ in range(P - 1)]
+            for j in range(S):
+                automaton = compute_automaton(A, P, range(p[m][j][k] - tolerance, p[m][j][k] + tolerance + 1), S)
+                if automaton is None:
+                    unreachable.append((m, j, k))
+                    image_sums = None
+                    continue
+                if image_sums is None:
+                    continue
+                for i, deltas in enumerate(_project(automaton)):
+                    image_sums[i] = {(total + Δ) % g for total in image_sums[i] for Δ in deltas}
+            if image_sums is not None:
+                for i in range(P - 1):
+                    sums[i].append(image_sums[i])
+
+        for i in range(P - 1):
+            if sums[i] and not set.intersection(*sums[i]):
+                inconsistent.append((k, i + 1))
+
+    return FeasibilityReport(sorted(unreachable), inconsistent)
+
+
+def _project(automaton: (int, list[int], list[(int, int, int)])) -> list[set[int]]:
+    """Returns, for each label position, the set of labels appearing there in words accepted by a layered automaton"""
+    start_state, final_states, transitions = automaton
+    edges = {}
+    for state, Δ, next_state in transitions:
+        edges.setdefault(state, []).append((Δ, next_state))
+
+    projection = []
+    states = {start_state}
+    while edges.keys() & states:
+        projection.append({Δ for state in states for Δ, _ in edges.get(state, [])})
+        states = {next_state for state in states for _, next_state in edges.get(state, [])}
+    return projection
+
+
+def solve(problem: Problem, formulation: str = CLASSIC, symmetry_breaking: bool = False, templates: ModelTemplateCache = None, hint: Solution = None, config: SolverConfig = None, cache=None, presolve: bool = True, deduplicate: bool = True, deduplicate_rotations: bool = False, on_solution: callable = None, cancellation: Cancellation = None) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon.
+
+        P is the count of identical and regular polygons in the stack ("pizzas")
+            - pizza 0 is at the bottom of the stack, P at the top
+        S is the count of triangles in pizzas ("slices")
+            - 0 being the top-most, proceeding clockwise
+        W is the count of windows per slice
+            - 0 being the top left, proceeding by columns then rows
+        A is the number of distinct angle offsets of filters in windows
+        p is the list of pixels of images
+            - p[m][j][k] is image m's pixel value at slice j and window k
+            - values are in range 0-100 (rounded percent)
+        formulation is the model formulation to use, see build_model
+        symmetry_breaking excludes solutions equivalent to others, see build_model
+        templates is the cache of model templates to use, see build_model
+        hint is a Solution whose α and n are used as a starting point for the search, see add_hint
+        config is the SolverConfig to use (defaults to SolverConfig())
+        cache is the SolutionCache to look the problem up in before solving, and to store the Solution in afterwards
+            - unknown outcomes of cancelled searches are not stored
+        presolve fails without building a model if analyze finds the problem infeasible
+        deduplicate models duplicate images and windows once, see find_duplicates
+        deduplicate_rotations also models images that are rotations of others once, offsetting pizza 0 in their n
+        on_solution is called with a Solution every time one is found, while the search continues, see solve_iter
+        cancellation stops the search when cancelled, see Cancellation
+
+    Returns:
+        α the list of angles for each filter on each window
+            - α[i][j][k] is the angle of the filter at window k on slice j on pizza i
+        n is the list of offsets, measured in slices, of each pizza in the stack to obtain a certain image
+            - n[m][i] is the slice offset of pizza i to get the image m (measured clock-wise)
+            - note that it's not defined for pizza 0 (there's nothing below)
+    """
+    config = config or SolverConfig()
+    if cache is not None:
+        solution = cache.get(problem, config.max_time_in_seconds)
+        if solution is not None:
+            return solution
+
+    if hint is not None and hint.α.shape != (problem.P, problem.S, problem.W):
+        raise ValueError("hint has a different geometry than the problem")
+
+    start = time.perf_counter()
+    reduction = find_duplicates(problem, deduplicate_rotations) if deduplicate else None
+    reduced = reduction.reduced if reduction else problem
+    build_times = {"deduplicate": time.perf_counter() - start}
+
+    start = time.perf_counter()
+    feasible = not presolve or analyze(reduced).feasible
+    build_times["analyze"] = time.perf_counter() - start
+    if not feasible:
+        solution = Solution(False, build_times["analyze"], [], [], telemetry=Telemetry(build_times))
+    else:
+        built = build_model(reduced, formulation, symmetry_breaking, templates)
+        built.build_times.update(build_times)
+        if hint is not None:
+            add_hint(built, reduction.restrict(hint) if reduction else hint)
+
+        def on_reduced_solution(solution: Solution):
+            on_solution(reduction.expand(solution) if reduction else solution)
+
+        solution = solve_model(built, reduced, config, on_reduced_solution if on_solution else None, cancellation=cancellation)
+
+    if reduction:
+        solution = reduction.expand(solution)
+
+    # cancelled searches did not use their time limit, their unknown outcomes must not be reused
+    cancelled = cancellation is not None and cancellation.cancelled
+    if cache is not None and not (cancelled and solution.success is None):
+        cache.put(problem, solution, config.max_time_in_seconds)
+    return solution
+
+
+def add_hint(built: Model, hint: Solution):
+    """
+    Hints the search in built towards the angles and offsets of a previous solution.
+
+    hint must have the same P, S and W as the model. Its offsets are used for the first len(hint.n) images only, so
+    images can be edited or appended in between.
+    """
+    α = built.α
+    n = built.n
+    P = len(α)
+    S = len(α[0])
+    W = len(α[0][0])
+    if hint.α.shape != (P, S, W):
+        raise ValueError("hint has a different geometry than the model")
+
+    for i in range(P):
         for j in range(S):
             for k in range(W):
-                start_state = 100
-                end_state = p[m][j][k]
-                model.AddAutomaton(D[j][k][m][1:], start_state, [end_state], transitions)
+                built.model.AddHint(α[i][j][k], hint.α[i][j][k])
+    for m in range(min(len(n), len(hint.n))):
+        for i in range(1, P):
+            built.model.AddHint(n[m][i], hint.n[m][i])
+
+
+def solve_incremental(problem: Problem, previous_problem: Problem, previous_solution: Solution, formulation: str = CLASSIC, templates: ModelTemplateCache = None, fixed_max_time_in_seconds: float = 60, config: SolverConfig = None) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon, starting from the solution of a similar problem.
+
+    previous_problem and previous_solution are a problem with the same geometry and its solution
+        - images are matched by index, images can be edited or appended
+    fixed_max_time_in_seconds bounds the first attempt, where offsets of unchanged images are kept as they were
+    other parameters are as in solve()
+
+    The search is hinted towards previous_solution. Offsets of unchanged images are first fixed, unless pizza 0 was
+    rotated to obtain them. If that fails or times out the problem is solved again with all offsets free.
+
+    Returns a Solution as solve() does, with wall_time including both attempts.
+    """
+    config = config or SolverConfig()
+    if not previous_solution.success:
+        return solve(problem, formulation, templates=templates, config=config)
+
+    # models never rotate pizza 0, so offsets of images obtained by rotating it (see find_duplicates) cannot be kept
+    n = previous_solution.n % problem.S
+    unchanged = [m for m in range(min(len(problem.p), len(previous_problem.p))) if problem.p[m] == previous_problem.p[m] and n[m][0] == 0]
+    if not unchanged:
+        return solve(problem, formulation, templates=templates, hint=previous_solution, config=config)
+
+    built = build_model(problem, formulation, templates=templates)
+    add_hint(built, previous_solution)
+    for m in unchanged:
+        for i in range(1, problem.P):
+            built.model.Add(built.n[m][i] == n[m][i])
+    fixed_solution = solve_model(built, problem, config.replace(max_time_in_seconds=fixed_max_time_in_seconds))
+    if fixed_solution.success:
+        return fixed_solution
+
+    solution = solve(problem, formulation, templates=templates, hint=previous_solution, config=config)
+    solution.wall_time += fixed_solution.wall_time
+    return solution
+
+
+def solve_soft(problem: Problem, objective: str = MISMATCHES, max_time_in_seconds: float = 60, max_objective: int = 0, on_solution: callable = None, formulation: str = CLASSIC, symmetry_breaking: bool = False, templates: ModelTemplateCache = None, hint: Solution = None, config: SolverConfig = None, cancellation: Cancellation = None) -> Solution:
+    """
+    Finds combinations of angles and rotations for an Opticon reproducing images as closely as possible.
+
+    objective measures how far a solution is from reproducing all pixels, see build_model
+    max_time_in_seconds stops the search, returning the best solution found so far
+        - it overrides the time limit of config
+    max_objective stops the search as soon as a solution at least this good is found
+    on_solution is called with a Solution every time an improving one is found during the search
+    other parameters are as in solve()
+
+    Returns the best Solution found, with its objective. success is:
+        - True if all pixels are reproduced exactly
+        - False if the best solution was proven not to reproduce all pixels, ie. the problem is infeasible
+        - None otherwise
+    """
+    built = build_model(problem, formulation, symmetry_breaking, templates, objective)
+    if hint is not None:
+        add_hint(built, hint)
+
+    config = (config or SolverConfig()).replace(max_time_in_seconds=max_time_in_seconds)
+    return solve_model(built, problem, config, on_solution, max_objective, cancellation)
+
+
+def solve_iter(problem: Problem, objective: str = None, **kwargs):
+    """
+    Searches for solutions to problem in a background thread, yielding them as they are found.
+
+    objective makes the search soft, as in solve_soft, which yields improving solutions
+    other arguments are passed to solve(), or solve_soft() if objective is not None
+
+    Yields each Solution found, then the Solution returned at the end of the search. Closing the generator early
+    cancels the search.
+    """
+    results = queue.Queue()
+    cancellation = Cancellation()
+
+    def run():
+        try:
+            if objective is None:
+                solution = solve(problem, on_solution=results.put, cancellation=cancellation, **kwargs)
+            else:
+                solution = solve_soft(problem, objective, on_solution=results.put, cancellation=cancellation, **kwargs)
+            results.put((solution,))
+        except Exception as e:
+            results.put(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if isinstance(result, Exception):
+                raise result
+            if isinstance(result, tuple):
+                yield result[0]
+                return
+            yield result
+    finally:
+        cancellation.cancel()
+        thread.join()
+
+
+class _SolutionCallback(cp_model.CpSolverSolutionCallback):
+    """Passes intermediate solutions to on_solution, stopping the search of soft models once max_objective is reached"""
+
+    def __init__(self, built: Model, on_solution: callable, max_objective: int):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.built = built
+        self.soft = built.model.HasObjective()
+        self.on_solution = on_solution
+        self.max_objective = max_objective
+
+    def OnSolutionCallback(self):
+        objective = round(self.ObjectiveValue()) if self.soft else None
+        if self.on_solution is not None:
+            success = True if not self.soft or objective == 0 else None
+            self.on_solution(Solution(success, self.WallTime(), *_values(self.Response(), self.built), objective, _telemetry(self.built, self)))
+        if self.soft and self.max_objective is not None and objective <= self.max_objective:
+            self.StopSearch()
+
+
+def _values(response: cp_model_pb2.CpSolverResponse, built: Model) -> (np.ndarray, np.ndarray):
+    """Returns values of α and n from the response of a solver, or a solution callback, extracted in bulk"""
+    values = np.asarray(response.solution)
+    α = values[np.asarray(_indices(built.α))]
+    n = values[np.asarray(_indices([n_m[1:] for n_m in built.n]))]
+    # pizza 0 is never rotated
+    return α, np.pad(n.reshape(len(built.n), -1), ((0, 0), (1, 0)))
+
+
+def solve_model(built: Model, problem: Problem, config: SolverConfig, on_solution: callable = None, max_objective: int = None, cancellation: Cancellation = None) -> Solution:
+    """
+    Solves a model built for problem by build_model, returning its Solution.
+
+    Constraints and hints can be added to built beforehand, eg. to resume or restrict a search.
+    config is the SolverConfig to use, other parameters are as in solve_soft
+        - max_objective only applies to models with an objective
+    """
+    if cancellation is not None and cancellation.cancelled:
+        return Solution(None, 0.0, [], [], telemetry=_telemetry(built))
 
     # Solve
     solver = cp_model.CpSolver()
-    solver.parameters.log_search_progress = True
-    solver.parameters.max_time_in_seconds = 6000
+    config.apply(solver)
+    log = []
+    solver.log_callback = lambda message: log.extend(message.splitlines())
 
-    status = solver.Solve(model)
+    soft = built.model.HasObjective()
+    done = cancellation.watch(solver) if cancellation is not None else None
+    try:
+        if soft or on_solution is not None:
+            status = solver.Solve(built.model, _SolutionCallback(built, on_solution, max_objective))
+        else:
+            status = solver.Solve(built.model)
+    finally:
+        if done is not None:
+            done.set()
 
     success = None
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
@@ -251,11 +1471,130 @@ def solve(problem: Problem) -> Solution:
     elif status == cp_model.MODEL_INVALID:
         raise cp_model.MODEL_INVALID
 
-    return Solution(
-        success,
-        solver.WallTime(),
-        [[[solver.Value(α[i][j][k]) for k in range(W)] for j in range(S)] for i in range(P)] if success else [],
-        [[solver.Value(n[m][i]) for i in range(P)] for m in range(M)] if success else [],
-        [[[solver.Value(j_corrected[j][m][i]) for i in range(P)] for m in range(M)] for j in range(S)] if success else [],
-        [[[[solver.Value(α_corrected[m][i][j][k]) for k in range(W)] for j in range(S)] for i in range(P)] for m in range(M)] if success else [],
-    )
+    telemetry = _telemetry(built, solver, log)
+    if not soft:
+        return Solution(success, solver.WallTime(), *(_values(solver.ResponseProto(), built) if success else ([], [])), telemetry=telemetry)
+
+    # soft models are always feasible, a solution reproducing all pixels is the actual success
+    objective = round(solver.ObjectiveValue()) if success else None
+    if objective is not None and objective > 0:
+        success = False if status == cp_model.OPTIMAL else None
+    return Solution(success, solver.WallTime(), *(_values(solver.ResponseProto(), built) if objective is not None else ([], [])), objective, telemetry)
+
+
+def _telemetry(built: Model, solver: cp_model.CpSolver = None, log: list[str] = None) -> Telemetry:
+    """
+    Returns the Telemetry of built, with search statistics of solver if it was run.
+
+    solver can also be a solution callback, to get statistics at the time a solution was found.
+    """
+    proto = built.model.Proto()
+    telemetry = Telemetry(built.build_times, len(proto.variables), len(proto.constraints), log=log)
+    if solver is not None:
+        telemetry.conflicts = solver.NumConflicts()
+        telemetry.branches = solver.NumBranches()
+        if built.model.HasObjective():
+            telemetry.bound = solver.BestObjectiveBound()
+    return telemetry
+
+
+def solve_portfolio(problem: Problem, configs: list[SolverConfig] = None, **kwargs) -> Solution:
+    """
+    Races solves of problem with different configurations, each in its own process.
+
+    configs is the list of configurations to race (defaults to the "fast-feasible" and "prove-infeasible" presets,
+    sharing all cores)
+    other arguments are passed to solve()
+
+    Returns the first Solution with a definitive answer, other solves are then terminated. If no solve reaches a
+    definitive answer, the last unknown Solution is returned. An exception raised by a solve is raised again, and
+    RuntimeError is raised if a process dies without an answer, eg. because it ran out of memory.
+    """
+    if configs is None:
+        num_workers = max(1, (os.cpu_count() or 1) // 2)
+        configs = [SolverConfig.preset(name, num_workers=num_workers) for name in ["fast-feasible", "prove-infeasible"]]
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_solve_to_queue, args=(results, problem, config, kwargs)) for config in configs]
+    for process in processes:
+        process.start()
+
+    try:
+        solution = None
+        for _ in processes:
+            result = _get_result(results, processes)
+            if isinstance(result, Exception):
+                raise result
+            solution = result
+            if solution.success is not None:
+                break
+        return solution
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+def _solve_to_queue(results: multiprocessing.Queue, problem: Problem, config: SolverConfig, kwargs: dict):
+    try:
+        results.put(solve(problem, config=config, **kwargs))
+    except Exception as e:
+        results.put(e)
+
+
+def _get_result(results: multiprocessing.Queue, processes: list[multiprocessing.Process]):
+    """Returns the next result put by _solve_to_queue, raising RuntimeError if a process died without putting one"""
+    while True:
+        try:
+            return results.get(timeout=0.1)
+        except queue.Empty:
+            # processes exit with a non-zero code if they crashed, and only exit after their result is in the queue
+            exitcodes = [process.exitcode for process in processes]
+            if any(exitcode not in (None, 0) for exitcode in exitcodes) or None not in exitcodes:
+                raise RuntimeError(f"solve processes died without an answer, exit codes {exitcodes}")
+
+
+def solve_many(problems, workers: int = None, per_problem_timeout: float = None, config: SolverConfig = None, **kwargs):
+    """
+    Solves many independent problems in a pool of worker processes.
+
+    problems is an iterable of Problems, consumed lazily
+    workers is the number of processes in the pool (defaults to the CPU count)
+    per_problem_timeout bounds the time spent on each problem, after which its result is unknown
+        - it overrides the time limit of config
+    config is the SolverConfig of each solve (defaults to one CP-SAT worker per process)
+    other arguments are passed to solve()
+
+    Each worker process keeps its own transition and model template caches, so problems sharing a geometry only pay for
+    building it once per worker.
+
+    Yields (problem, result) pairs as solves complete, in no particular order. result is the Solution, or the exception
+    solve() raised for problem. Closing the generator cancels problems that were not started yet, and stops the
+    searches of those in progress, see Cancellation.
+    """
+    workers = workers or os.cpu_count() or 1
+    config = config or SolverConfig(num_workers=1)
+    if per_problem_timeout is not None:
+        config = config.replace(max_time_in_seconds=per_problem_timeout)
+
+    problems = iter(problems)
+    with multiprocessing.Manager() as manager:
+        cancellation = Cancellation(manager.Event())
+        executor = ProcessPoolExecutor(max_workers=workers)
+        pending = {}
+        try:
+            while True:
+                # keep workers busy without materializing all problems upfront
+                for problem in problems:
+                    pending[executor.submit(solve, problem, config=config, cancellation=cancellation, **kwargs)] = problem
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.exception() or future.result()
+        finally:
+            cancellation.cancel()
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,38 @@
+import numpy as np
+from solver.solver import Problem, compute_transmittance, correct
+
+# _COS2[Δ] is the fraction of energy flowing through two filters rotated by Δ degrees, as computed by compute_energy
+_COS2 = np.array([compute_transmittance(Δ) for Δ in range(180)])
+
+
+def simulate(α, n) -> np.ndarray:
+    """
+    Computes the energies of all pixels of all images obtained by an Opticon, in one vectorized pass.
+
+        α is an array of angles, shaped (..., P, S, W)
+            - α[..., i, j, k] is the angle of the filter at window k on slice j on pizza i
+        n is an array of offsets, shaped (..., M, P)
+            - n[..., m, i] is the slice offset of pizza i to get the image m
+        leading dimensions, if any, are broadcast against each other to simulate batches of candidate solutions
+
+    Returns an integer array of energies shaped (..., M, S, W), rounded after every pizza exactly as compute_energy does.
+    """
+    _, α_corrected = correct(α, n)
+    M, P, S, W = α_corrected.shape[-4:]
+
+    # D[..., m, i, j, k] is the angle delta between pizza i + 1 and pizza i
+    D = (α_corrected[..., 1:, :, :] - α_corrected[..., :-1, :, :]) % 180
+
+    energy = np.full(α_corrected.shape[:-4] + (M, S, W), 100.0)
+    for i in range(P - 1):
+        energy = np.floor(energy * _COS2[D[..., i, :, :]] + 0.5)
+    return energy.astype(int)
+
+
+def verify(problem: Problem, α, n) -> np.ndarray:
+    """
+    Computes the per-pixel errors of a candidate solution to problem, see simulate for α and n.
+
+    Returns an integer array shaped (..., M, S, W) of differences between simulated energies and p.
+    """
+    return simulate(α, n) - np.asarray(problem.p)
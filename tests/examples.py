@@ -0,0 +1,17 @@
+"""Small problems shared by tests"""
+from solver.solver import Problem
+
+# an image with all pixels at full energy
+ALL_ON = [[100], [100], [100], [100]]
+
+FEASIBLE = Problem(3, 4, 1, 4, [
+    [[100], [0], [0], [0]],
+    ALL_ON,
+    [[100], [0], [0], [100]],
+])
+
+# three 90° deltas cannot be the same filters as four 0° deltas
+INFEASIBLE = Problem(2, 4, 1, 4, [
+    [[100], [0], [0], [0]],
+    ALL_ON,
+])
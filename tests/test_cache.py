@@ -0,0 +1,71 @@
+import os
+from solver.solver import Cancellation, Problem, Solution, SolverConfig, solve
+from solver.cache import SolutionCache, canonicalize
+from solver.verifier import verify
+from examples import FEASIBLE, INFEASIBLE
+
+
+def rotate(problem: Problem, r: int, order: list[int]) -> Problem:
+    S = problem.S
+    return Problem(problem.P, S, problem.W, problem.A, [[problem.p[m][(j - r) % S] for j in range(S)] for m in order])
+
+
+def test_canonicalize():
+    problem = Problem(3, 4, 2, 4, [
+        [[100, 0], [0, 0], [0, 0], [0, 0]],
+        [[100, 100], [100, 100], [100, 100], [100, 100]],
+        [[100, 0], [0, 0], [0, 100], [0, 0]],
+    ])
+    key = canonicalize(problem)[0]
+    for r in range(4):
+        assert canonicalize(rotate(problem, r, [2, 0, 1]))[0] == key
+
+    different = Problem(3, 4, 2, 4, [problem.p[0], problem.p[1], problem.p[0]])
+    assert canonicalize(different)[0] != key
+
+
+def test_solution_cache(tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    solution = solve(FEASIBLE, cache=cache)
+    assert solution.success
+
+    # rotated and reordered problems are remapped from the cached solution
+    for r in range(4):
+        rotated = rotate(FEASIBLE, r, [1, 2, 0])
+        cached = cache.get(rotated)
+        assert cached.success
+        assert (verify(rotated, cached.α, cached.n) == 0).all()
+        assert cached.n.tolist() == solution.n[[1, 2, 0]].tolist()
+        assert len(cached.j_corrected) == 4
+        assert len(cached.α_corrected) == 3
+
+    # infeasible outcomes are recorded too
+    assert solve(INFEASIBLE, cache=cache).success is False
+    assert cache.get(rotate(INFEASIBLE, 1, [1, 0])).success is False
+
+    # unknown outcomes are only reused if more time would not be spent on them
+    unknown = Problem(2, 4, 1, 4, [[[50], [0], [0], [0]]])
+    cache.put(unknown, Solution(None, 10, [], []), max_time_in_seconds=10)
+    assert cache.get(unknown, 10).success is None
+    assert cache.get(unknown, 100) is None
+    assert solve(unknown, cache=cache, config=SolverConfig(max_time_in_seconds=5)).success is None
+
+    # least recently used solutions are evicted first
+    size = sum(os.path.getsize(os.path.join(tmp_path, name)) for name in os.listdir(tmp_path))
+    cache.max_bytes = size
+    cache.get(FEASIBLE)
+    os.utime(os.path.join(tmp_path, canonicalize(INFEASIBLE)[0] + ".json"), (0, 0))
+    cache.put(Problem(2, 4, 1, 4, [[[0], [0], [0], [0]]]), Solution(False, 0, [], []))
+    assert cache.get(INFEASIBLE) is None
+    assert cache.get(FEASIBLE) is not None
+
+
+def test_solution_cache_cancelled(tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    cancellation = Cancellation()
+    cancellation.cancel()
+    assert solve(FEASIBLE, cache=cache, cancellation=cancellation).success is None
+
+    # the cancelled search is not mistaken for one that ran out of time
+    assert cache.get(FEASIBLE) is None
+    assert solve(FEASIBLE, cache=cache).success
@@ -0,0 +1,51 @@
+import pytest
+from solver.solver import Cancellation
+from solver.checkpoint import Checkpoint, solve_resumable
+from solver.generator import generate
+from solver.verifier import verify
+from examples import INFEASIBLE
+
+
+def test_solve_resumable(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    problem, _ = generate(3, 8, 1, 8, 2, seed=0)
+
+    # a search interrupted before finding anything can be resumed
+    cancellation = Cancellation()
+    cancellation.cancel()
+    solution = solve_resumable(problem, path, cancellation=cancellation)
+    assert solution.success is None
+    assert not Checkpoint.load(path).done
+
+    solution = solve_resumable(problem, path, max_time_in_seconds=60)
+    assert solution.success
+    assert (verify(problem, solution.α, solution.n) == 0).all()
+    checkpoint = Checkpoint.load(path)
+    assert checkpoint.done
+    assert checkpoint.solution.objective == 0
+
+    # completed searches are not run again
+    assert solve_resumable(problem, path, max_time_in_seconds=60).α.tolist() == solution.α.tolist()
+    assert Checkpoint.load(path).elapsed == checkpoint.elapsed
+
+    # checkpoints of other models are rejected
+    other, _ = generate(3, 8, 1, 8, 2, seed=1)
+    with pytest.raises(ValueError):
+        solve_resumable(other, path)
+
+
+def test_solve_resumable_infeasible(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    solution = solve_resumable(INFEASIBLE, path, max_time_in_seconds=60, interval=0.01)
+    assert solution.success is False
+    assert solution.objective > 0
+    assert Checkpoint.load(path).bound == solution.objective
+
+    # a resumed search starts from the best solution and the bound proven so far
+    checkpoint = Checkpoint.load(path)
+    checkpoint.done = False
+    checkpoint.save(path)
+    resumed = solve_resumable(INFEASIBLE, path, max_time_in_seconds=60)
+    assert resumed.success is False
+    assert resumed.objective == solution.objective
+    assert resumed.wall_time > solution.wall_time
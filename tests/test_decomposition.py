@@ -0,0 +1,62 @@
+import pytest
+from solver.solver import Problem
+from solver.decomposition import compute_pieces, solve_decomposed, solve_piece
+from solver.generator import generate
+from solver.verifier import verify
+from examples import ALL_ON, FEASIBLE, INFEASIBLE
+
+
+def test_compute_pieces():
+    problem = Problem(3, 4, 2, 4, [
+        [[100, 0], [0, 0], [0, 100], [0, 0]],
+        [[100, 100], [100, 100], [100, 100], [100, 100]],
+    ])
+
+    # a single image, every pixel depends on its own filters only
+    pieces = compute_pieces(problem, [[0, 1, 2]])
+    assert len(pieces) == 2 * 4
+    for k, filters, constraints in pieces:
+        assert len(filters) == 3
+        assert len(constraints) == 1
+
+    # a second image with different offsets links pixels together
+    pieces = compute_pieces(problem, [[0, 0, 0], [0, 1, 0]])
+    assert sorted(len(filters) for _, filters, _ in pieces) == [12, 12]
+    for k, filters, constraints in pieces:
+        assert len(constraints) == 2 * 4
+        for end_state, chain in constraints:
+            assert len(chain) == 3
+            assert all(0 <= f < len(filters) for f, _ in chain)
+
+
+@pytest.mark.parametrize(
+    "problem,expected",
+    [
+        (Problem(2, 4, 1, 4, [
+            [[0], [0], [0], [0]],
+            ALL_ON,
+        ]), True),
+        (FEASIBLE, True),
+        (INFEASIBLE, False),
+    ]
+)
+def test_solve_decomposed(problem, expected):
+    solution = solve_decomposed(problem, workers=2)
+    assert solution.success is expected
+    if not solution.success:
+        return
+
+    assert all(n_m[0] == 0 for n_m in solution.n)
+    assert (verify(problem, solution.α, solution.n) == 0).all()
+
+
+def test_solve_decomposed_timeout():
+    problem, planted = generate(4, 8, 3, 8, 6, seed=0)
+    k, filters, constraints = compute_pieces(problem, planted.n.tolist())[0]
+    with pytest.raises(TimeoutError):
+        solve_piece(problem.A, problem.P, len(filters), constraints, S=problem.S, max_time_in_seconds=0)
+
+    # pieces are stopped at the deadline of the whole search
+    solution = solve_decomposed(problem, workers=2, max_time_in_seconds=1)
+    assert solution.success is None
+    assert solution.wall_time < 10
@@ -0,0 +1,31 @@
+from solver.explain import IMAGES, PIXELS, WINDOWS, explain
+from solver.generator import generate
+from solver.solver import Problem, solve
+
+
+def subproblem(problem: Problem, images: list[int]) -> Problem:
+    return Problem(problem.P, problem.S, problem.W, problem.A, [problem.p[m] for m in images], problem.tolerance)
+
+
+def test_explain():
+    planted, _ = generate(2, 4, 2, 4, 3, seed=0)
+    problem = Problem(2, 4, 2, 4, planted.p[:2] + [[[100, 100], [100, 100], [100, 100], [100, 100]]] + planted.p[2:])
+    assert solve(problem).success is False
+
+    # from subsets of images, and from assumptions
+    for max_subset_size in [3, 0]:
+        explanation = explain(problem, IMAGES, max_subset_size, workers=1)
+        assert explanation.feasible is False
+        assert explanation.minimal
+        images = [m for m, in explanation.core]
+        assert solve(subproblem(problem, images)).success is False
+        for dropped in images:
+            assert solve(subproblem(problem, [m for m in images if m != dropped])).success is True
+
+    for blocks in [WINDOWS, PIXELS]:
+        explanation = explain(problem, blocks, workers=1)
+        assert explanation.feasible is False
+        assert explanation.minimal
+        assert len({block[0] for block in explanation.core}) > 1
+
+    assert explain(subproblem(problem, [0, 1, 3]), max_subset_size=2, workers=1).feasible is True
@@ -0,0 +1,34 @@
+import pytest
+from solver.solver import compute_energy_levels, solve
+from solver.generator import generate, perturb
+from solver.verifier import verify
+
+
+# rotations add angles that are not valid angles when S is 8 and A is 4, or S is 4 and A is 2
+@pytest.mark.parametrize("P,S,W,A,M", [(2, 4, 1, 4, 2), (3, 8, 2, 8, 3), (3, 6, 1, 3, 4), (2, 8, 1, 4, 2), (3, 4, 2, 2, 3)])
+def test_generate(P, S, W, A, M):
+    problem, planted = generate(P, S, W, A, M, seed=0)
+    assert (problem.P, problem.S, problem.W, problem.A, len(problem.p)) == (P, S, W, A, M)
+    assert (planted.n[:, 0] == 0).all()
+    assert (verify(problem, planted.α, planted.n) == 0).all()
+    assert generate(P, S, W, A, M, seed=0)[0].p == problem.p
+
+    solution = solve(problem)
+    assert solution.success
+    assert (verify(problem, solution.α, solution.n) == 0).all()
+
+
+def test_perturb():
+    problem, planted = generate(3, 8, 4, 8, 4, seed=1)
+    perturbed, _ = generate(3, 8, 4, 8, 4, seed=1, perturbation=0.25)
+    levels = compute_energy_levels(8, 3, 8)[-1]
+
+    errors = verify(perturbed, planted.α, planted.n)
+    assert (errors != 0).sum() == round(0.25 * errors.size)
+    for before, after in zip(problem.p, perturbed.p):
+        for row_before, row_after in zip(before, after):
+            for e_before, e_after in zip(row_before, row_after):
+                assert e_after in levels
+                assert abs(levels.index(e_after) - levels.index(e_before)) <= 1
+
+    assert perturb(problem, 0).p == problem.p
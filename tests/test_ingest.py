@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from PIL import Image
+import ingest
+from ingest import iter_problems, load_image, quantize, sample
+from printer import BIG, compute_window_centers
+from solver.solver import compute_energy_levels
+
+
+def test_load_image(tmp_path):
+    pixels = np.array([[[0, 0, 0, 255], [255, 255, 255, 255]], [[0, 0, 0, 0], [255, 0, 0, 255]]], dtype=np.uint8)
+    Image.fromarray(pixels, "RGBA").save(tmp_path / "image.png")
+    # transparent areas are white
+    assert np.allclose(load_image(str(tmp_path / "image.png")), [[0, 1], [1, 0.299]])
+
+
+def test_load_svg_image(tmp_path):
+    pytest.importorskip("cairosvg")
+    (tmp_path / "image.svg").write_text('<svg xmlns="http://www.w3.org/2000/svg" width="2" height="1"><rect width="1" height="1"/></svg>')
+    assert np.allclose(load_image(str(tmp_path / "image.svg")), [[0, 1]])
+
+
+def test_load_svg_image_without_cairosvg(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "cairosvg", None)
+    (tmp_path / "image.svg").write_text('<svg xmlns="http://www.w3.org/2000/svg" width="2" height="1"/>')
+    with pytest.raises(ImportError, match="cairosvg"):
+        load_image(str(tmp_path / "image.svg"))
+
+
+def test_compute_window_centers():
+    centers = compute_window_centers(8, BIG[0], BIG[2])
+    assert centers.shape == (8, 7, 2)
+    # windows are numbered as in Problem, from the top left by columns then rows, rows being rings from the outermost
+    assert np.allclose(np.hypot(centers[0, :, 0], centers[0, :, 1]), np.array([27, 22, 22, 17, 17, 12, 7]) / 64 * BIG[0])
+    assert np.allclose(centers[0, [0, 1, 3, 5, 6], 0], 0)
+    assert (centers[0, [2, 4], 0] > 0).all()
+    # slice 0 is at the top, in SVG coordinates
+    assert (centers[0, :, 1] < 0).all()
+    # rotating a pizza by one slice clockwise moves every window to the same window of the next slice
+    rotation = np.array([[np.cos(np.pi / 4), -np.sin(np.pi / 4)], [np.sin(np.pi / 4), np.cos(np.pi / 4)]])
+    assert np.allclose(centers @ rotation.T, np.roll(centers, -1, axis=0))
+
+    with pytest.raises(ValueError):
+        compute_window_centers(3, BIG[0], BIG[2])
+
+
+def draw(S: int, dark: list[(int, int)], size: int = 200) -> np.ndarray:
+    """Returns a white image with a pizza of the BIG geometry fit in it, with dark (slice, window) windows"""
+    image = np.ones((size, size))
+    scale = size / BIG[0]
+    centers = compute_window_centers(S, BIG[0], BIG[2]) * scale + size / 2
+    y, x = np.mgrid[0:size, 0:size]
+    for j, k in dark:
+        image[(x - centers[j, k, 0]) ** 2 + (y - centers[j, k, 1]) ** 2 <= (BIG[1] * scale) ** 2] = 0
+    return image
+
+
+def test_sample():
+    levels = sample(draw(8, [(0, 0), (0, 6), (3, 2)]), 8, BIG)
+    assert levels.shape == (8, 7)
+    expected = np.ones((8, 7))
+    expected[0, 0] = expected[0, 6] = expected[3, 2] = 0
+    assert np.allclose(levels, expected)
+
+
+def test_quantize():
+    energies = compute_energy_levels(8, 3, 8)[-1]
+    assert quantize(np.array([0.0, 0.24, 0.26, 1.0]), 8, 3, 8).tolist() == [0, 25, 25, 100]
+    assert set(quantize(np.linspace(0, 1, 101), 8, 3, 8).tolist()) == set(energies)
+
+
+def test_iter_problems(tmp_path):
+    for design, images in [("a", [[(0, 0)], [(1, 1)]]), ("b", [[(2, 2)]])]:
+        (tmp_path / design).mkdir()
+        for m, dark in enumerate(images):
+            Image.fromarray(np.round(draw(8, dark) * 255).astype(np.uint8)).save(tmp_path / design / f"{m}.png")
+    (tmp_path / "b" / "notes.txt").write_text("ignored")
+
+    problems = iter_problems(str(tmp_path), 3, 8, 8)
+    name, problem = next(problems)
+    assert name == "a"
+    assert (problem.P, problem.S, problem.W, problem.A) == (3, 8, 7, 8)
+    assert len(problem.p) == 2
+    assert problem.p[0][0][0] == 0 and problem.p[0][1][1] == 100
+    assert problem.p[1][0][0] == 100 and problem.p[1][1][1] == 0
+
+    name, problem = next(problems)
+    assert name == "b" and len(problem.p) == 1
+    assert next(problems, None) is None
+
+    assert load_image(str(tmp_path / "a" / "0.png")).shape == (200, 200)
@@ -0,0 +1,27 @@
+import numpy as np
+from solver.generator import generate
+from solver.lazy import find_offsets, solve_lazy
+from solver.solver import ModelTemplateCache, Problem
+from solver.verifier import verify
+from examples import INFEASIBLE
+
+
+def test_find_offsets():
+    problem, planted = generate(3, 8, 2, 8, 4, seed=0)
+    n, errors = find_offsets(problem, planted.α, [3, 1])
+    assert errors.tolist() == [0, 0]
+    assert (verify(Problem(3, 8, 2, 8, [problem.p[3], problem.p[1]]), planted.α, n) == 0).all()
+
+
+def test_solve_lazy():
+    problem, _ = generate(3, 4, 4, 4, 12, seed=1)
+    templates = ModelTemplateCache()
+    solution = solve_lazy(problem, templates=templates)
+    assert solution.success
+    assert solution.n.shape == (12, 3)
+    assert (verify(problem, solution.α, solution.n) == 0).all()
+    # only some of the images were modeled
+    assert max(key[4] for key in templates.templates) < 12
+
+    assert solve_lazy(INFEASIBLE).success is False
+    assert np.asarray(solve_lazy(INFEASIBLE).n).size == 0
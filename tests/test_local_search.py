@@ -0,0 +1,38 @@
+import threading
+import time
+import numpy as np
+from solver.solver import Problem, SolverConfig
+from solver.local_search import anneal, search
+from solver.verifier import verify
+from examples import FEASIBLE
+
+
+def test_anneal():
+    error, α, n = anneal(FEASIBLE, 0, 10)
+    assert error == 0
+    assert (verify(FEASIBLE, α, n) == 0).all()
+    assert (n[:, 0] == 0).all()
+
+    # the best assignment is returned even if it is not a solution
+    hard = Problem(3, 8, 2, 8, [[[50, 0], [0, 50], [50, 50], [0, 0], [25, 0], [0, 13], [50, 0], [0, 0]]] * 2 + [[[0, 0]] * 8])
+    error, α, n = anneal(hard, 0, 0.1)
+    assert error == np.abs(verify(hard, α, n)).sum()
+
+    # chains stop early once another one found a solution
+    stop = threading.Event()
+    stop.set()
+    start = time.monotonic()
+    anneal(hard, 0, 60, stop=stop)
+    assert time.monotonic() - start < 10
+
+
+def test_search():
+    solution = search(FEASIBLE, 10, chains=2)
+    assert solution.success
+    assert (verify(FEASIBLE, solution.α, solution.n) == 0).all()
+    assert solution.j_corrected[1][2].tolist() == [(1 - solution.n[2][i]) % 4 for i in range(3)]
+
+    # CP-SAT completes the best assignment found
+    solution = search(FEASIBLE, 0, chains=1, refine=True, config=SolverConfig(max_time_in_seconds=10))
+    assert solution.success
+    assert (verify(FEASIBLE, solution.α, solution.n) == 0).all()
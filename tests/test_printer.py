@@ -0,0 +1,44 @@
+import io
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+import pytest
+from printer import BIG, SMALL, compute_window_centers, export_fabrication, write_fabrication_svg
+from solver.generator import generate
+
+SVG = "{http://www.w3.org/2000/svg}"
+XLINK = "{http://www.w3.org/1999/xlink}"
+
+
+def test_export_fabrication(tmp_path):
+    _, solution = generate(3, 8, 2, 8, 2, seed=0)
+    paths = export_fabrication(solution, str(tmp_path), SMALL)
+    assert len(paths) == 3
+
+    centers = compute_window_centers(8, SMALL[0], SMALL[2], 105, 148.5).reshape(-1, 2)
+    for i, path in enumerate(paths):
+        root = ElementTree.parse(path).getroot()
+        definitions = {d.get("id"): d for d in root.find(SVG + "defs")}
+        # windows of the same angle share a definition
+        assert {f"filter-{a}" for a in np.unique(solution.α[i]).tolist()} | {"hole"} == definitions.keys()
+        for angle in np.unique(solution.α[i]).tolist():
+            assert definitions[f"filter-{angle}"].find(SVG + "path").get("transform") == f"rotate({angle})"
+
+        uses = [u for u in root.findall(SVG + "use") if u.get(XLINK + "href") != "#hole"]
+        assert [u.get(XLINK + "href") for u in uses] == [f"#filter-{a}" for a in solution.α[i].reshape(-1).tolist()]
+        positions = np.array([[float(u.get("x")), float(u.get("y"))] for u in uses])
+        assert np.allclose(positions, centers, atol=1e-3)
+        # the central window is only cut
+        assert len(root.findall(SVG + "use")) == len(uses) + 1
+
+
+def test_write_fabrication_svg_label():
+    _, solution = generate(3, 8, 2, 8, 2, seed=0)
+    file = io.StringIO()
+    write_fabrication_svg(file, solution.α[0], SMALL, label="<Tom & Jerry>")
+    assert ElementTree.fromstring(file.getvalue()).find(SVG + "text").text == "<Tom & Jerry>"
+
+
+def test_export_fabrication_geometry_mismatch(tmp_path):
+    _, solution = generate(2, 8, 2, 8, 2, seed=0)
+    with pytest.raises(ValueError, match="7 windows per slice, the solution has 2"):
+        export_fabrication(solution, str(tmp_path), BIG)
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from solver.cache import SolutionCache
+from solver.generator import generate
+from solver.service import CANCELLED, DONE, FINISHED, RUNNING, SolveService
+from solver.solver import Solution, SolverConfig
+from solver.verifier import verify
+from examples import FEASIBLE, INFEASIBLE
+
+
+async def request(port: int, method: str, path: str, body: str = "") -> (int, bytes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = body.encode("utf-8")
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), content
+
+
+def test_service():
+    async def run():
+        service = SolveService(workers=2, config=SolverConfig(max_time_in_seconds=60, num_workers=1))
+        await service.start()
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            # problems can be posted as JSON lines, duplicates share a job
+            lines = "\n".join(json.dumps(line) for line in [
+                {"name": "feasible", "problem": FEASIBLE.to_dict()},
+                INFEASIBLE.to_dict(),
+                {"problem": FEASIBLE.to_dict()},
+            ])
+            status, content = await request(port, "POST", "/jobs", lines)
+            assert status == 200
+            jobs = json.loads(content)["jobs"]
+            assert jobs[0]["id"] == jobs[2]["id"]
+            assert jobs[0]["name"] == "feasible"
+
+            # events are streamed until the job finishes
+            status, content = await request(port, "GET", f"/jobs/{jobs[0]['id']}/events")
+            events = [json.loads(line) for line in content.splitlines()]
+            assert events[0]["status"] == "queued"
+            assert events[-1]["status"] == DONE
+            solution = Solution.from_dict(events[-1]["solution"])
+            assert (verify(FEASIBLE, solution.α, solution.n) == 0).all()
+
+            # finished jobs are polled, and deduplicated too
+            while True:
+                status, content = await request(port, "GET", f"/jobs/{jobs[1]['id']}")
+                if json.loads(content)["status"] in FINISHED:
+                    break
+                await asyncio.sleep(0.05)
+            assert json.loads(content)["solution"]["success"] is False
+            status, content = await request(port, "POST", "/jobs", json.dumps(INFEASIBLE.to_dict()))
+            assert json.loads(content)["jobs"][0]["id"] == jobs[1]["id"]
+            assert len(service.jobs) == 2
+
+            # cancelled jobs are not reused
+            soft = {"problem": INFEASIBLE.to_dict(), "objective": "mismatches", "max_time_in_seconds": 60}
+            job = service.submit(**service.parse(json.dumps(soft).encode("utf-8"))[0])
+            service.cancel(job.id)
+            status, content = await request(port, "DELETE", f"/jobs/{job.id}")
+            assert status == 200
+            assert json.loads(content)["status"] == CANCELLED
+            status, content = await request(port, "POST", "/jobs", json.dumps([soft]))
+            id = json.loads(content)["jobs"][0]["id"]
+            assert id != job.id
+            while service.jobs[id].status not in FINISHED:
+                await asyncio.sleep(0.05)
+            assert service.jobs[id].solution.objective > 0
+
+            # errors are reported
+            assert (await request(port, "POST", "/jobs", "{"))[0] == 400
+            assert (await request(port, "GET", "/jobs/unknown"))[0] == 404
+            assert (await request(port, "PUT", "/jobs"))[0] == 405
+        finally:
+            server.close()
+            await server.wait_closed()
+            await service.close()
+
+    asyncio.run(run())
+
+
+def test_service_resubmit_cancelled(tmp_path):
+    problem, _ = generate(3, 8, 4, 8, 4, seed=1)
+
+    async def run():
+        service = SolveService(config=SolverConfig(max_time_in_seconds=60, num_workers=1), cache=SolutionCache(str(tmp_path)))
+        await service.start()
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async def wait(id: str, statuses) -> dict:
+                while True:
+                    status, content = await request(port, "GET", f"/jobs/{id}")
+                    if json.loads(content)["status"] in statuses:
+                        return json.loads(content)
+                    await asyncio.sleep(0.05)
+
+            # a job cancelled while running does not leave its unknown outcome in the cache
+            status, content = await request(port, "POST", "/jobs", json.dumps(problem.to_dict()))
+            id = json.loads(content)["jobs"][0]["id"]
+            await wait(id, [RUNNING])
+            await request(port, "DELETE", f"/jobs/{id}")
+            job = await wait(id, FINISHED)
+            assert job["status"] == CANCELLED
+            assert job["solution"]["success"] is None
+            assert service.cache.get(problem) is None
+
+            # so the same problem posted again is solved
+            status, content = await request(port, "POST", "/jobs", json.dumps(problem.to_dict()))
+            resubmitted = json.loads(content)["jobs"][0]["id"]
+            assert resubmitted != id
+            job = await wait(resubmitted, FINISHED)
+            assert job["status"] == DONE
+            assert job["solution"]["success"]
+        finally:
+            server.close()
+            await server.wait_closed()
+            await service.close()
+
+    asyncio.run(run())
@@ -1,7 +1,16 @@
+import itertools
+import json
 import math
+import os
 import random
+import threading
+import time
+import numpy as np
 import pytest
-from solver.solver import Problem, compute_valid_angles, compute_energy, compute_transitions, solve
+from solver.generator import generate
+from solver.solver import CLASSIC, ERROR, FORMULATIONS, LEAN, ModelTemplateCache, Problem, Solution, analyze, angles_form_group, build_model, compute_valid_angles, find_duplicates, compute_automaton, compute_energy, compute_energy_levels, compute_transitions, compute_valid_deltas, Cancellation, MISMATCHES, model_size, rotations_preserve_angles, SolverConfig, solve, solve_incremental, solve_iter, solve_many, solve_portfolio, solve_soft
+from solver.verifier import simulate, verify
+from examples import ALL_ON, FEASIBLE, INFEASIBLE
 
 
 # Test valid input values
@@ -61,6 +70,23 @@ def test_compute_energy(previous_energy, Δ, expected):
     assert expected == actual
 
 
+@pytest.mark.parametrize(
+    "S,A,expected_rotations,expected_group",
+    [
+        (4, 2, False, True),
+        (4, 4, True, True),
+        (8, 4, False, True),
+        (8, 8, True, True),
+        (3, 3, True, True),
+        (8, 7, False, False),
+        (7, 8, False, True),
+    ]
+)
+def test_symmetries(S, A, expected_rotations, expected_group):
+    assert rotations_preserve_angles(S, A) == expected_rotations
+    assert angles_form_group(A) == expected_group
+
+
 @pytest.mark.parametrize(
     "A,P,expected",
     [
@@ -109,6 +135,73 @@ def test_compute_transitions(A, P, expected):
     assert expected == actual
 
 
+def test_compute_valid_deltas():
+    assert compute_valid_deltas(8) == [0, 45, 90, 135]
+    assert compute_valid_deltas(8, 8) == [0, 45, 90, 135]
+    # rotating by one slice adds 45 degrees, which is not a valid angle
+    assert compute_valid_deltas(4) == [0, 90]
+    assert compute_valid_deltas(4, 8) == [0, 45, 90, 135]
+    assert compute_energy_levels(4, 2, 8) == [[100], [0, 50, 100]]
+
+
+def test_solve_rotation_deltas():
+    # the second image rotates pizza 1 by one slice, ie. 45°, which none of the 4 valid angles differ by
+    α = np.zeros((2, 8, 1), dtype=int)
+    n = np.array([[0, 0], [0, 1]])
+    problem = Problem(2, 8, 1, 4, simulate(α, n).tolist())
+    assert problem.p[1] == [[50]] * 8
+    assert analyze(problem).feasible
+    solution = solve(problem)
+    assert solution.success
+    assert (verify(problem, solution.α, solution.n) == 0).all()
+
+
+def test_compute_energy_levels():
+    assert compute_energy_levels(4, 3) == [[100], [0, 100], [0, 100]]
+    assert compute_energy_levels(8, 4) == [[100], [0, 50, 100], [0, 25, 50, 100], [0, 13, 25, 50, 100]]
+    assert compute_energy_levels(8, 5)[-1] == [0, 7, 13, 25, 50, 100]
+
+
+def test_compute_energy_is_symmetric():
+    # Δ and 180 - Δ have the same effect, floating point noise must not round them differently
+    for previous_energy in range(101):
+        for Δ in range(180):
+            assert compute_energy(previous_energy, Δ) == compute_energy(previous_energy, (180 - Δ) % 180)
+
+
+@pytest.mark.parametrize(
+    "A,P,targets,expected",
+    [
+        # 90° in either pizza turns energy off, deltas in the other one do not matter
+        (4, 3, [0], (0, [3], [(0, 0, 2), (0, 90, 1), (1, 0, 3), (1, 90, 3), (2, 90, 3)])),
+        (4, 3, [100], (0, [2], [(0, 0, 1), (1, 0, 2)])),
+        (4, 3, [50], None),
+        # 45° and 135° have the same effect, at every pizza
+        (8, 4, [13], (0, [3], [(0, 45, 1), (0, 135, 1), (1, 45, 2), (1, 135, 2), (2, 45, 3), (2, 135, 3)])),
+        # any energy but 0: 50 and 100 have the same outcome, so they are merged
+        (8, 3, range(1, 101), (0, [2], [(0, 0, 1), (0, 45, 1), (0, 135, 1), (1, 0, 2), (1, 45, 2), (1, 135, 2)])),
+    ]
+)
+def test_compute_automaton(A, P, targets, expected):
+    assert compute_automaton(A, P, targets) == expected
+
+
+def test_compute_automaton_is_exact():
+    A = 8
+    P = 4
+    valid_angles = compute_valid_angles(A)
+    for target in compute_energy_levels(A, P)[-1]:
+        start_state, final_states, transitions = compute_automaton(A, P, [target])
+        edges = {(state, Δ): next_state for state, Δ, next_state in transitions}
+        for word in itertools.product(valid_angles, repeat=P - 1):
+            energy = 100
+            state = start_state
+            for Δ in word:
+                energy = compute_energy(energy, Δ)
+                state = edges.get((state, Δ))
+            assert (state in final_states) == (energy == target)
+
+
 @pytest.fixture(scope='module')
 def global_data():
     return {'wall_time_success': [], 'wall_time_failure': [], 'wall_time_unknown': []}
@@ -160,8 +253,10 @@ def global_data():
         ),
     ]
 )
-def test_solve(global_data, problem):
-    solution = solve(problem)
+@pytest.mark.parametrize("formulation", FORMULATIONS)
+@pytest.mark.parametrize("symmetry_breaking", [False, True])
+def test_solve(global_data, problem, formulation, symmetry_breaking):
+    solution = solve(problem, formulation, symmetry_breaking)
 
     if solution.success is False:
         global_data['wall_time_failure'].append(solution.wall_time)
@@ -181,6 +276,12 @@ def test_solve(global_data, problem):
     n = solution.n
     α = solution.α
 
+    # symmetry breaking pins
+    if symmetry_breaking and angles_form_group(problem.A):
+        assert α[0][0][0] == 0
+    if symmetry_breaking and rotations_preserve_angles(S, problem.A):
+        assert n[0].tolist() == [0] * P
+
     # internal consistency checks
     j_corrected = solution.j_corrected
     for m in range(len(p)):
@@ -196,18 +297,10 @@ def test_solve(global_data, problem):
                     assert α_corrected[m][i][j][k] == (α[i][j_corrected[j][m][i]][k] + math.floor(360.0 / S) * n[m][i]) % 180
 
     # consistency of actual results
-    for m in range(len(p)):
-        for j in range(S):
-            for k in range(W):
-                energy = 100
-                for i in range(1, P):
-                    n_under = n[m][i - 1]
-                    α_under = α[i - 1][(j - n_under) % S][k]
-                    n_over = n[m][i]
-                    α_over = α[i][(j - n_over) % S][k]
-                    energy = round(compute_energy(energy, α_over + 360.0 / S * (n_over) - (α_under + 360.0 / S * n_under)))
-                print(f"p[{m}][{j}][{k}] EXPECTED: {p[m][j][k]} ACTUAL: {energy}")
-                assert abs(p[m][j][k] - energy) < 2
+    errors = verify(problem, α, n)
+    for m, j, k in zip(*errors.nonzero()):
+        print(f"p[{m}][{j}][{k}] EXPECTED: {p[m][j][k]} ACTUAL: {p[m][j][k] + errors[m, j, k]}")
+    assert (abs(errors) <= problem.tolerance).all()
 
 
 def test_solve_randomized(global_data):
@@ -231,7 +324,401 @@ def test_solve_randomized(global_data):
                             p,
                         )
 
-                        test_solve(global_data, problem)
+                        test_solve(global_data, problem, CLASSIC, False)
+
+
+def test_solve_tolerance():
+    p = [
+        [[98], [0], [2], [0]],
+        [[100], [100], [99], [100]],
+        [[100], [0], [1], [100]],
+    ]
+    assert solve(Problem(3, 4, 1, 4, p)).success is False
+
+    problem = Problem(3, 4, 1, 4, p, tolerance=2)
+    solution = solve(problem)
+    assert solution.success
+    assert (abs(verify(problem, solution.α, solution.n)) <= 2).all()
+
+    solution = solve_soft(Problem(2, 4, 1, 8, [[[52], [0], [0], [0]]], tolerance=1), ERROR, max_objective=None)
+    assert solution.objective == 1
+
+
+def test_solution():
+    solution = Solution(True, 1.0, [[[0], [90]], [[90], [0]]], [[0, 1], [0, 0]])
+    assert solution.α.shape == (2, 2, 1)
+    assert solution.n[0][1] == 1
+    assert solution.j_corrected.shape == (2, 2, 2)
+    assert solution.j_corrected[0][0].tolist() == [0, 1]
+    assert solution.α_corrected[0][1].tolist() == [[0], [90]]
+    with pytest.raises(AttributeError):
+        solution.extra = None
+
+    restored = Solution.from_dict(json.loads(json.dumps(solution.to_dict())))
+    assert restored.α.tolist() == solution.α.tolist()
+    assert restored.n.tolist() == solution.n.tolist()
+
+    failed = Solution(False, 1.0, [], [])
+    assert len(failed.j_corrected) == 0
+
+
+def test_find_duplicates():
+    p = [
+        [[100, 100], [0, 0], [0, 0], [0, 0]],
+        [[100, 100], [100, 100], [100, 100], [100, 100]],
+        [[100, 100], [0, 0], [0, 0], [100, 100]],
+        [[100, 100], [0, 0], [0, 0], [0, 0]],
+        # image 2, rotated by one slice
+        [[100, 100], [100, 100], [0, 0], [0, 0]],
+    ]
+    problem = Problem(3, 4, 2, 4, p)
+
+    reduction = find_duplicates(problem)
+    assert reduction.images == [(0, 0), (1, 0), (2, 0), (0, 0), (3, 0)]
+    assert reduction.windows == [0, 0]
+    assert len(reduction.reduced.p) == 4
+    assert reduction.reduced.W == 1
+
+    reduction = find_duplicates(problem, rotations=True)
+    assert reduction.images == [(0, 0), (1, 0), (2, 0), (0, 0), (2, 1)]
+    assert len(reduction.reduced.p) == 3
+    variables, reduced_variables = reduction.variable_counts()
+    assert reduced_variables < variables / 2
+
+    # rotations do not preserve angles
+    assert len(find_duplicates(Problem(3, 7, 2, 4, [p_m + [[0, 0]] * 3 for p_m in p]), rotations=True).reduced.p) == 4
+
+    for deduplicate_rotations in [False, True]:
+        solution = solve(problem, deduplicate_rotations=deduplicate_rotations)
+        assert solution.success
+        assert (verify(problem, solution.α, solution.n) == 0).all()
+        assert solution.n[3].tolist() == solution.n[0].tolist()
+        assert solution.α[0][1][0] == solution.α[0][1][1]
+        if deduplicate_rotations:
+            assert solution.n[4].tolist() == ((solution.n[2] + 1) % 4).tolist()
+
+        # hints refer to the original problem
+        hinted = solve(problem, hint=solution, deduplicate_rotations=deduplicate_rotations)
+        assert hinted.success
+
+        # hints with pizza 0 rotated are normalized, as models never rotate it
+        reduction = find_duplicates(problem, deduplicate_rotations)
+        rotated = Solution(True, 0, solution.α, (solution.n + 1) % 4)
+        assert reduction.restrict(rotated).n.tolist() == reduction.restrict(solution).n.tolist()
+        assert (reduction.restrict(rotated).n[:, 0] == 0).all()
+        assert solve(problem, symmetry_breaking=True, hint=rotated, deduplicate_rotations=deduplicate_rotations).success
+
+
+def test_analyze():
+    report = analyze(FEASIBLE)
+    assert report.feasible
+
+    # only 0 and 100 are reachable with two angles
+    report = analyze(Problem(3, 4, 1, 4, [
+        [[100], [0], [50], [0]],
+        ALL_ON,
+    ]))
+    assert not report.feasible
+    assert report.unreachable == [(0, 2, 0)]
+
+    # three 90° deltas cannot be the same filters as four 0° deltas
+    report = analyze(INFEASIBLE)
+    assert report.unreachable == []
+    assert report.inconsistent == [(0, 1)]
+    assert solve(INFEASIBLE).success is False
+    assert solve(INFEASIBLE, presolve=False).success is False
+
+    # planted problems always pass
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        P, S, W, A, M = 3, 8, 2, 8, 4
+        α = rng.choice(compute_valid_angles(A), size=(P, S, W))
+        n = rng.integers(0, S, size=(M, P))
+        n[:, 0] = 0
+        assert analyze(Problem(P, S, W, A, simulate(α, n).tolist())).feasible
+
+
+def test_model_size():
+    problem = Problem(3, 8, 2, 8, [
+        [[0, 50], [0, 0], [50, 50], [0, 0], [0, 50], [0, 0], [50, 50], [0, 0]],
+        [[50, 0], [0, 0], [0, 50], [50, 0], [0, 0], [50, 0], [0, 0], [0, 50]],
+    ])
+    classic_variables, classic_constraints = model_size(problem, "classic")
+    lean_variables, lean_constraints = model_size(problem, "lean")
+    assert lean_variables < classic_variables
+    assert lean_constraints < classic_constraints
+
+    with pytest.raises(ValueError):
+        model_size(problem, "unknown")
+
+
+def test_model_templates(tmp_path):
+    problem_0 = Problem(2, 4, 1, 4, [[[0], [0], [0], [0]], ALL_ON])
+    problem_1 = Problem(2, 4, 1, 4, [[[100], [0], [100], [0]], [[0], [100], [0], [100]]])
+    problem_2 = Problem(3, 4, 1, 4, [[[0], [0], [0], [0]], ALL_ON])
+
+    templates = ModelTemplateCache(maxsize=1, directory=str(tmp_path))
+    built_0 = build_model(problem_0, templates=templates)
+    built_1 = build_model(problem_1, templates=templates)
+    assert templates.builds == 1
+    # templates are copied, pixel constraints are not shared
+    assert len(built_0.model.Proto().constraints) == len(built_1.model.Proto().constraints)
+    assert len(templates.templates[(2, 4, 1, 4, 2, CLASSIC, False)].model.Proto().constraints) < len(built_0.model.Proto().constraints)
+
+    build_model(problem_2, templates=templates)
+    assert templates.builds == 2
+    assert len(templates.templates) == 1
+
+    # templates are reloaded from disk
+    templates = ModelTemplateCache(maxsize=1, directory=str(tmp_path))
+    for problem in [problem_0, problem_1, problem_2]:
+        assert solve(problem, templates=templates).success
+    assert templates.builds == 0
+    assert set(templates.templates[(3, 4, 1, 4, 2, CLASSIC, False)].build_times) == {"α", "n", "j_corrected", "α_corrected", "D", "symmetries"}
+
+    # templates written without build times are still usable
+    build_model(problem_0, symmetry_breaking=True, templates=templates)
+    for name in os.listdir(tmp_path):
+        if name.endswith(".json"):
+            with open(tmp_path / name) as file:
+                layout = json.load(file)
+            layout.pop("build_times")
+            with open(tmp_path / name, "w") as file:
+                json.dump(layout, file)
+    templates = ModelTemplateCache(maxsize=1, directory=str(tmp_path))
+    built = build_model(problem_0, symmetry_breaking=True, templates=templates)
+    assert templates.builds == 0
+    assert "symmetries" in built.build_times
+
+
+def test_solve_incremental():
+    previous_problem = Problem(3, 4, 1, 4, [
+        [[100], [0], [0], [0]],
+        ALL_ON,
+    ])
+    previous_solution = solve(previous_problem)
+    assert previous_solution.success
+
+    # appending an image keeps offsets of previous ones
+    problem = Problem(3, 4, 1, 4, previous_problem.p + [[[100], [0], [0], [100]]])
+    solution = solve_incremental(problem, previous_problem, previous_solution)
+    assert solution.success
+    assert solution.n[:2].tolist() == previous_solution.n.tolist()
+
+    # editing an image frees offsets if needed
+    problem = Problem(3, 4, 1, 4, [
+        [[100], [0], [0], [0]],
+        [[0], [0], [0], [0]],
+        [[0], [100], [100], [100]],
+    ])
+    solution = solve_incremental(problem, previous_problem, previous_solution)
+    assert solution.success
+
+    # offsets of images obtained by rotating pizza 0 are not kept, others are, so the first attempt succeeds
+    previous_problem = Problem(3, 4, 1, 4, [
+        [[100], [0], [0], [0]],
+        [[0], [100], [0], [0]],
+    ])
+    previous_solution = solve(previous_problem, deduplicate_rotations=True)
+    assert previous_solution.n[1][0] == 1
+    problem = Problem(3, 4, 1, 4, previous_problem.p + [ALL_ON])
+    solution = solve_incremental(problem, previous_problem, previous_solution, config=SolverConfig(max_time_in_seconds=0))
+    assert solution.success
+    assert solution.n[0].tolist() == previous_solution.n[0].tolist()
+
+    with pytest.raises(ValueError):
+        solve(Problem(2, 4, 1, 4, previous_problem.p), hint=previous_solution)
+
+
+def test_solve_soft():
+    assert solve(INFEASIBLE).success is False
+
+    solutions = []
+    solution = solve_soft(INFEASIBLE, max_objective=None, on_solution=solutions.append)
+    assert solution.success is False
+    assert solution.objective == 1
+    assert (verify(INFEASIBLE, solution.α, solution.n) != 0).sum() == 1
+    assert solutions[-1].objective == 1
+    assert all(previous.objective > following.objective for previous, following in zip(solutions, solutions[1:]))
+
+    solution = solve_soft(INFEASIBLE, ERROR, max_objective=None)
+    assert solution.success is False
+    assert solution.objective == abs(verify(INFEASIBLE, solution.α, solution.n)).sum()
+
+    # search stops as soon as a good enough solution is found
+    solutions = []
+    solution = solve_soft(INFEASIBLE, max_objective=4, on_solution=solutions.append)
+    assert len(solutions) == 1
+    assert solution.objective <= 4
+
+    solution = solve_soft(FEASIBLE)
+    assert solution.success
+    assert solution.objective == 0
+
+    with pytest.raises(ValueError):
+        solve_soft(FEASIBLE, "unknown")
+
+
+def test_solve_iter():
+    feasible = Problem(3, 4, 1, 4, [
+        [[100], [0], [0], [0]],
+        ALL_ON,
+        [[100], [0], [0], [100]],
+        [[100], [0], [0], [0]],
+    ])
+    solutions = list(solve_iter(feasible))
+    assert len(solutions) >= 2
+    assert all(solution.success for solution in solutions)
+    for solution in solutions:
+        assert (verify(feasible, solution.α, solution.n) == 0).all()
+
+    solutions = list(solve_iter(INFEASIBLE, MISMATCHES, max_objective=None))
+    assert solutions[-1].success is False
+    assert all(previous.objective >= following.objective for previous, following in zip(solutions, solutions[1:]))
+
+
+def test_cancellation():
+    random.seed(1)
+    levels = compute_energy_levels(8, 3)[-1]
+    problem = Problem(3, 8, 4, 8, [[[random.choice(levels) for k in range(4)] for j in range(8)] for _ in range(4)])
+
+    # cancelled from another thread
+    cancellation = Cancellation()
+    threading.Timer(1, cancellation.cancel).start()
+    solution = solve_soft(problem, max_time_in_seconds=60, max_objective=None, cancellation=cancellation)
+    assert solution.success is None
+    assert solution.wall_time < 30
+
+    # cancelled before starting
+    solution = solve(problem, cancellation=cancellation, presolve=False)
+    assert solution.success is None
+
+    # cancelled by closing the generator
+    start = time.monotonic()
+    solutions = solve_iter(problem, MISMATCHES, max_time_in_seconds=60, max_objective=None)
+    assert next(solutions).objective > 0
+    solutions.close()
+    assert time.monotonic() - start < 30
+
+
+def test_solver_config():
+    config = SolverConfig.preset("fast-feasible", num_workers=2, parameters={"cp_model_probing_level": 0})
+    assert config.num_workers == 2
+    assert config.parameters == {"linearization_level": 0, "cp_model_probing_level": 0}
+    changed = config.replace(max_time_in_seconds=1)
+    assert changed.max_time_in_seconds == 1
+    assert changed.num_workers == 2
+    assert config.max_time_in_seconds == 6000
+
+    with pytest.raises(ValueError):
+        SolverConfig.preset("unknown")
+
+    config = SolverConfig(num_workers=4, random_seed=42, deterministic=True, max_time_in_seconds=100)
+    first = solve(FEASIBLE, config=config)
+    second = solve(FEASIBLE, config=config)
+    assert first.success
+    assert (first.α.tolist(), first.n.tolist()) == (second.α.tolist(), second.n.tolist())
+
+
+def test_telemetry():
+    telemetry = solve(FEASIBLE, LEAN, templates=ModelTemplateCache()).telemetry
+    assert set(telemetry.build_times) == {"α", "n", "α_corrected", "D", "symmetries", "instantiate", "automata", "deduplicate", "analyze"}
+    assert telemetry.build_time > 0
+    assert telemetry.variables > 0 and telemetry.constraints > 0
+    assert telemetry.presolve_time is not None
+    assert telemetry.first_solution_time is not None
+    assert telemetry.bound is None
+    json.dumps(telemetry.to_dict())
+
+    # soft models report their progress towards the objective
+    telemetry = solve_soft(FEASIBLE, max_time_in_seconds=60).telemetry
+    assert telemetry.bound == 0
+    bests = [best for _, event, best, _ in telemetry.progress if event.isdigit()]
+    assert bests[-1] == 0
+    assert bests == sorted(bests, reverse=True)
+
+    # the log is not captured if disabled, search statistics still are
+    telemetry = solve(FEASIBLE, config=SolverConfig(log_search_progress=False)).telemetry
+    assert telemetry.log == [] and telemetry.progress == []
+    assert telemetry.first_solution_time is None
+    assert telemetry.branches > 0
+
+    # problems rejected by analyze are never modeled
+    telemetry = solve(INFEASIBLE).telemetry
+    assert set(telemetry.build_times) == {"deduplicate", "analyze"}
+    assert telemetry.variables == 0
+
+
+def test_solve_portfolio():
+    solution = solve_portfolio(FEASIBLE)
+    assert solution.success
+    assert (verify(FEASIBLE, solution.α, solution.n) == 0).all()
+
+    configs = [SolverConfig(num_workers=1, random_seed=seed) for seed in range(3)]
+    assert solve_portfolio(INFEASIBLE, configs, symmetry_breaking=True).success is False
+
+
+def exit_process(solution):
+    os._exit(1)
+
+
+def test_solve_portfolio_failures():
+    problem = Problem(3, 4, 1, 4, [
+        [[100], [0], [0], [0]],
+        ALL_ON,
+    ])
+    configs = [SolverConfig(num_workers=1, random_seed=seed) for seed in range(2)]
+    with pytest.raises(ValueError):
+        solve_portfolio(problem, configs, formulation="bogus")
+    with pytest.raises(RuntimeError):
+        solve_portfolio(problem, configs, on_solution=exit_process)
+
+
+def test_solve_many():
+    problems = [FEASIBLE, INFEASIBLE] * 3
+
+    results = list(solve_many(iter(problems), workers=2, per_problem_timeout=10))
+    assert len(results) == len(problems)
+    for problem, solution in results:
+        assert solution.success is (problem is FEASIBLE)
+
+    # errors are reported per problem, without dropping other results
+    broken = Problem(3, 4, 1, 4, [[[100], [0]]])
+    results = dict(solve_many([broken, FEASIBLE], workers=2))
+    assert isinstance(results[broken], IndexError)
+    assert results[FEASIBLE].success
+
+    # closing the generator early cancels remaining problems, and stops those in progress
+    hard, _ = generate(4, 8, 3, 8, 6, seed=0)
+    results = solve_many([FEASIBLE, hard, hard], workers=2)
+    next(results)
+    start = time.monotonic()
+    results.close()
+    assert time.monotonic() - start < 30
+
+    # no time to solve anything
+    problem, solution = next(solve_many([FEASIBLE], per_problem_timeout=0))
+    assert solution.success is None
+
+
+def test_solve_many_randomized():
+    random.seed(0)
+    problems = []
+    for W in range(1, 3):
+        for P in range(2, 4):
+            for S in [4, 8]:
+                for A in [2, 4]:
+                    for M in range(2, 4):
+                        transitions = compute_transitions(A, P)
+                        p = [[[random.choice(transitions)[2] for k in range(W)] for j in range(S)] for _ in range(M)]
+                        problems.append(Problem(P, S, W, A, p))
+
+    results = list(solve_many(problems, per_problem_timeout=60))
+    assert sorted(map(id, problems)) == sorted(id(problem) for problem, _ in results)
+    for problem, solution in results:
+        assert solution.success is not None
+        if solution.success:
+            assert (verify(problem, solution.α, solution.n) == 0).all()
 
 
 def test_report_results(global_data):
@@ -0,0 +1,69 @@
+import math
+import random
+import re
+import numpy as np
+from solver.solver import Problem, compute_energy
+from solver.verifier import simulate, verify
+
+
+def reference_energies(α, n, S, W, P):
+    """Simulates an Opticon one pixel at a time with compute_energy"""
+    energies = []
+    for n_m in n:
+        energies_m = []
+        for j in range(S):
+            energies_mj = []
+            for k in range(W):
+                energy = 100
+                for i in range(1, P):
+                    α_under = α[i - 1][(j - n_m[i - 1]) % S][k] + math.floor(360.0 / S) * n_m[i - 1]
+                    α_over = α[i][(j - n_m[i]) % S][k] + math.floor(360.0 / S) * n_m[i]
+                    energy = compute_energy(energy, (α_over - α_under) % 180)
+                energies_mj.append(energy)
+            energies_m.append(energies_mj)
+        energies.append(energies_m)
+    return energies
+
+
+def test_simulate():
+    random.seed(0)
+    for P, S, W, A, M in [(2, 4, 1, 4, 2), (3, 8, 2, 8, 3), (4, 6, 3, 12, 2), (3, 7, 2, 5, 4)]:
+        angles = [math.floor(360.0 / A * a) % 180 for a in range(A)]
+        α = [[[random.choice(angles) for k in range(W)] for j in range(S)] for i in range(P)]
+        n = [[0] + [random.randrange(S) for i in range(1, P)] for m in range(M)]
+
+        assert simulate(α, n).tolist() == reference_energies(α, n, S, W, P)
+
+
+def test_simulate_batches():
+    rng = np.random.default_rng(0)
+    α = rng.choice([0, 45, 90, 135], size=(5, 3, 8, 2))
+    n = rng.integers(0, 8, size=(5, 4, 3))
+
+    energies = simulate(α, n)
+    assert energies.shape == (5, 4, 8, 2)
+    for b in range(5):
+        assert (energies[b] == simulate(α[b], n[b])).all()
+
+    # a single set of offsets is broadcast to all candidate angles
+    energies = simulate(α, n[0])
+    assert energies.shape == (5, 4, 8, 2)
+    assert (energies[3] == simulate(α[3], n[0])).all()
+
+
+def test_verify():
+    # the solution found for the octaopticon.py problem during hack week
+    with open("hack_week_big.txt") as f:
+        text = f.read()
+    α = [None] * 3
+    for i, slices in re.findall(r"α for pizza (\d+):\n((?: +slice.*\n)+)", text):
+        α[int(i)] = [[int(a) for a in re.findall(r"\d+", line.split(":")[1])] for line in slices.splitlines()]
+    n = [[int(o) for o in re.findall(r"\d+", offsets)] for offsets in re.findall(r"image \d+: (\[.*\])", text)]
+
+    from octaopticon import problem
+    assert (verify(problem, α, n) == 0).all()
+
+    wrong = Problem(problem.P, problem.S, problem.W, problem.A, [[[50] * problem.W] * problem.S] * 4)
+    errors = verify(wrong, α, n)
+    assert errors.shape == (4, 8, 7)
+    assert (errors == np.asarray(problem.p) - 50).all()